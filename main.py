@@ -16,12 +16,19 @@ i18n.set('skip_locale_root_data', True)
 
 def main() -> None:
     from neonbot import bot
-    from neonbot.utils.constants import PLAYER_CACHE_DIR, YOUTUBE_DOWNLOADS_DIR
+    from neonbot.classes.download_cache import DownloadCache
+    from neonbot.classes.track_index import TrackIndex
+    from neonbot.classes.ytdl_cache import YtdlCache
+    from neonbot.utils.constants import PLAYER_CACHE_DIR, YOUTUBE_DOWNLOADS_DIR, YOUTUBE_EXTRACT_CACHE_DIR
 
     if env.bool('YTDL_AUTO_CLEAR_DOWNLOADS', default=False):
         shutil.rmtree(YOUTUBE_DOWNLOADS_DIR, ignore_errors=True)
     os.makedirs(YOUTUBE_DOWNLOADS_DIR, exist_ok=True)
     os.makedirs(PLAYER_CACHE_DIR, exist_ok=True)
+    os.makedirs(YOUTUBE_EXTRACT_CACHE_DIR, exist_ok=True)
+    YtdlCache.prune()
+    DownloadCache.load()
+    TrackIndex.load()
 
     # Clear debug.log on startup
     open('./debug.log', 'w').close()
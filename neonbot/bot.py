@@ -60,7 +60,10 @@ class NeonBot(commands.Bot):
         )
 
     async def setup_hook(self):
+        from neonbot.classes.ytdl import Ytdl
+
         self.loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        Ytdl.start_engine()
 
         await self.db.initialize()
         self.setting = await SettingModel.get_instance()
@@ -94,8 +97,12 @@ class NeonBot(commands.Bot):
 
         from neonbot.classes.panel import Panel
         from neonbot.classes.flyff import Flyff
+        from neonbot.classes.stream_refresher import StreamRefresher
+        from neonbot.classes.ytdl_cache import YtdlCache
 
         Flyff.start_listener()
+        StreamRefresher.start_listener()
+        YtdlCache.start_listener()
 
         for guild in self.guilds:
             server = GuildModel.get_instance(guild.id)
@@ -113,10 +120,11 @@ class NeonBot(commands.Bot):
 
         from neonbot.classes.player import Player
 
-        for guild in self.guilds:
-            if Player.has_cache(guild.id):
-                log.info(f'Loading player cache on {guild} ({guild.id})...')
-                self.loop.create_task(Player.load_cache(guild.id))
+        guild_ids = [guild.id for guild in self.guilds if Player.has_cache(guild.id)]
+
+        if guild_ids:
+            log.info(f'Restoring {len(guild_ids)} players...')
+            self.loop.create_task(Player.load_all_cache(guild_ids))
 
         self.is_player_cache_loaded = True
 
@@ -191,6 +199,8 @@ class NeonBot(commands.Bot):
 
     async def close(self) -> None:
         from neonbot.classes.player import Player
+        from neonbot.classes.track_index import TrackIndex
+        from neonbot.classes.ytdl_engine import YtdlEngine
 
         if self.scheduler:
             log.info('Stopping scheduler...')
@@ -203,6 +213,12 @@ class NeonBot(commands.Bot):
         log.info('Stopping all music...')
         await asyncio.gather(*[player.reset(timeout=3, clear_cache=False) for player in Player.servers.values()])
 
+        log.info('Saving track index...')
+        TrackIndex.save()
+
+        log.info('Stopping extraction processes...')
+        YtdlEngine.shutdown()
+
         log.info('Closing session...')
         await self.session.close()
 
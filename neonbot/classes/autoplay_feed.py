@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Optional, Set
+
+from envparse import env
+
+from neonbot import bot
+from neonbot.classes.track import Track
+from neonbot.classes.ytdl import Ytdl
+from neonbot.classes.ytdl_info import YtdlInfo
+from neonbot.classes.ytmusic import YTMusic
+from neonbot.enums import ExtractPriority
+from neonbot.utils import log
+from neonbot.utils.exceptions import YtdlError
+
+if TYPE_CHECKING:
+    from neonbot.classes.player import Player
+
+
+class AutoplayFeed:
+    """
+    Related tracks for a player to autoplay, fetched ahead of time.
+
+    A batch of related tracks is fetched per seed and kept in a buffer that is
+    topped up once it runs low. Tracks already queued or suggested are skipped
+    and the next candidate is extracted in the background, so picking it is as
+    fast as moving to the next queued track.
+    """
+
+    BATCH_SIZE = env.int('AUTOPLAY_BATCH_SIZE', default=10)
+    # Candidates left in the buffer before another batch is fetched
+    LOW_WATER = 2
+
+    def __init__(self, player: Player) -> None:
+        self.player = player
+        self.buffer: Deque[str] = deque()
+        self.suggested: Set[str] = set()
+        self.seed: Optional[str] = None
+        self.fill_task: Optional[asyncio.Task] = None
+        self.resolve_task: Optional[asyncio.Task] = None
+        self.resolve_id: Optional[str] = None
+
+    def prepare(self, track: Track) -> None:
+        """Gets candidates ready for when the given track ends."""
+
+        # Picks from another seed don't fit what the users queued themselves
+        if track.requested is not bot.user and track.id != self.seed:
+            self.clear()
+
+        if len(self.buffer) <= self.LOW_WATER and not (self.fill_task and not self.fill_task.done()):
+            # Set ahead of the fetch so changes while it runs don't take it for another seed
+            self.seed = track.id
+            self.fill_task = self.player.loop.create_task(self.fill(track.id))
+            return
+
+        self.resolve_head()
+
+    async def fill(self, seed: str) -> None:
+        try:
+            video_ids = await YTMusic().get_related_videos(seed, limit=self.BATCH_SIZE)
+        except Exception as error:
+            log.warn(f'Failed to fetch autoplay candidates for {seed}: {error}')
+            return
+
+        for video_id in video_ids:
+            if video_id not in self.suggested:
+                self.suggested.add(video_id)
+                self.buffer.append(video_id)
+
+        self.resolve_head()
+
+    def get_head(self) -> Optional[str]:
+        # Tracks queued since they were fetched are dropped when they reach the head
+        while self.buffer and self.player.queue.has(self.buffer[0]):
+            self.buffer.popleft()
+
+        return self.buffer[0] if self.buffer else None
+
+    def resolve_head(self) -> None:
+        video_id = self.get_head()
+
+        if not video_id or video_id == self.resolve_id:
+            return
+
+        if self.resolve_task and not self.resolve_task.done():
+            self.resolve_task.cancel()
+
+        self.resolve_id = video_id
+        self.resolve_task = self.player.loop.create_task(self.resolve(video_id))
+
+    @staticmethod
+    async def resolve(video_id: str) -> YtdlInfo:
+        return await Ytdl().extract_info(
+            'https://www.youtube.com/watch?v=' + video_id, priority=ExtractPriority.AUTOPLAY
+        )
+
+    async def next(self, track: Track) -> Optional[dict]:
+        """Takes the next candidate, fetching one first if nothing was prepared."""
+
+        self.prepare(track)
+
+        # Only wait for a batch when there is nothing to pick from yet
+        if not self.get_head() and self.fill_task and not self.fill_task.done():
+            await asyncio.wait([self.fill_task])
+
+        while video_id := self.get_head():
+            self.buffer.popleft()
+
+            try:
+                if video_id == self.resolve_id and self.resolve_task and not self.resolve_task.cancelled():
+                    ytdl_info = await self.resolve_task
+                else:
+                    ytdl_info = await self.resolve(video_id)
+            except YtdlError as error:
+                log.warn(f'Skipped autoplay candidate {video_id}: {error}')
+                continue
+            finally:
+                self.resolve_id = self.resolve_task = None
+
+            data = ytdl_info.get_track()
+
+            if data:
+                return data
+
+        return None
+
+    def clear(self) -> None:
+        for task in (self.fill_task, self.resolve_task):
+            if task and not task.done():
+                task.cancel()
+
+        self.buffer.clear()
+        self.seed = self.fill_task = self.resolve_task = self.resolve_id = None
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from time import perf_counter
+from typing import Callable, Optional, Tuple
+
+import discord
+
+from neonbot.classes.player_telemetry import PlayerTelemetry
+from neonbot.classes.track import Track
+
+# Length of an opus frame in seconds
+FRAME_LENGTH = discord.opus.Encoder.FRAME_LENGTH / 1000
+
+
+class ChainedSource(discord.AudioSource):
+    """
+    Plays a track and moves on to the next queued one without a gap.
+
+    Shortly before the track ends on_preroll is called so the next source can
+    be opened and start buffering. When the track runs out the queued source
+    takes over inside the voice client's send loop and on_switch is called.
+    Both callbacks run on the event loop.
+    """
+
+    def __init__(
+        self,
+        source: discord.AudioSource,
+        track: Track,
+        *,
+        loop: asyncio.AbstractEventLoop,
+        preroll: float,
+        on_preroll: Callable[[], None],
+        on_switch: Callable[[], None],
+        offset: float = 0,
+        telemetry: Optional[PlayerTelemetry] = None,
+    ) -> None:
+        self.source = source
+        self.track = track
+        self.loop = loop
+        self.preroll = preroll
+        self.on_preroll = on_preroll
+        self.on_switch = on_switch
+        self.upcoming: Optional[Tuple[discord.AudioSource, Track]] = None
+        self.frames = 0
+        # Where in the track the source started
+        self.offset = offset
+        self.prerolled = False
+        self.lock = threading.Lock()
+        self.telemetry = telemetry
+        # Cleared once the first packet is in, pre-rolled sources have long started by the time they play
+        self.created_at: Optional[float] = perf_counter()
+
+    @property
+    def next_track(self) -> Optional[Track]:
+        upcoming = self.upcoming
+
+        return upcoming[1] if upcoming else None
+
+    @property
+    def position(self) -> float:
+        return self.offset + self.frames * FRAME_LENGTH
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def read(self) -> bytes:
+        started_at = perf_counter()
+        data = self.source.read()
+
+        if data:
+            self.frames += 1
+
+            if self.telemetry:
+                self.record(perf_counter() - started_at)
+
+            if (
+                not self.prerolled
+                and self.preroll > 0
+                and self.track.duration
+                and self.position >= self.track.duration - self.preroll
+            ):
+                self.prerolled = True
+                self.loop.call_soon_threadsafe(self.on_preroll)
+
+            return data
+
+        with self.lock:
+            upcoming, self.upcoming = self.upcoming, None
+
+        if not upcoming:
+            return b''
+
+        self.source.cleanup()
+        self.source, self.track = upcoming
+        self.frames = 0
+        self.offset = 0
+        self.prerolled = False
+        self.loop.call_soon_threadsafe(self.on_switch)
+
+        return self.read()
+
+    def record(self, elapsed: float) -> None:
+        self.telemetry.frames += 1
+
+        if self.created_at is not None:
+            self.telemetry.ffmpeg_start.add(perf_counter() - self.created_at)
+            self.created_at = None
+        elif elapsed > FRAME_LENGTH:
+            # FFmpeg couldn't keep up and the voice client had to wait for the packet
+            self.telemetry.underruns += 1
+
+    def queue(self, source: discord.AudioSource, track: Track) -> None:
+        with self.lock:
+            previous, self.upcoming = self.upcoming, (source, track)
+
+        if previous:
+            previous[0].cleanup()
+
+    def cancel_next(self) -> None:
+        with self.lock:
+            previous, self.upcoming = self.upcoming, None
+
+        if previous:
+            previous[0].cleanup()
+
+    def cleanup(self) -> None:
+        self.source.cleanup()
+        self.cancel_next()
@@ -14,6 +14,7 @@ from neonbot.classes.chatgpt.chatgpt import ChatGPT
 from neonbot.models.flyff import FlyffModel
 from neonbot.models.guild import GuildModel
 from neonbot.models.setting import SettingModel
+from neonbot.models.spotify_match import SpotifyMatchModel
 from neonbot.utils import log
 
 
@@ -36,7 +37,7 @@ class Database:
         log.info('Connecting to Database...')
         client = MotorClient(mongo_url, db_port, username=db_username, password=db_password)
         self.db = client.get_database(db_name)
-        await init_beanie(database=self.db, document_models=[GuildModel, SettingModel, FlyffModel])
+        await init_beanie(database=self.db, document_models=[GuildModel, SettingModel, FlyffModel, SpotifyMatchModel])
         log.info(f'MongoDB connection established in {(time() - start_time):.2f}s')
 
         await SettingModel.initialize()
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from os import path
+from time import time
+from typing import Dict, Set
+
+from envparse import env
+
+from neonbot.utils import log
+from neonbot.utils.constants import YOUTUBE_DOWNLOADS_DIR, YOUTUBE_DOWNLOADS_INDEX_PATH, YOUTUBE_DOWNLOADS_TMP_DIR
+
+
+class DownloadCache:
+    """
+    Keeps downloaded audio files within a byte budget.
+
+    An index on disk tracks the size, last access and play count of every file
+    so the least valuable ones are evicted first. Files of queued tracks are
+    never evicted, and neither are new files, which are downloaded before their
+    track is queued and haven't had a chance to be played.
+    """
+
+    # In megabytes
+    MAX_SIZE = env.int('YTDL_DOWNLOAD_CACHE_SIZE', default=5120) * 1024 * 1024
+    # Either lru (least recently played) or lfu (least played)
+    POLICY = env.str('YTDL_DOWNLOAD_CACHE_POLICY', default='lru')
+    # In seconds
+    GRACE_PERIOD = env.int('YTDL_DOWNLOAD_CACHE_GRACE_PERIOD', default=600)
+
+    entries: Dict[str, dict] = {}
+    size = 0
+
+    @classmethod
+    def load(cls) -> None:
+        """Reconciles the index with the files that are actually on disk."""
+
+        # Anything left in the temp directory is an interrupted download
+        shutil.rmtree(YOUTUBE_DOWNLOADS_TMP_DIR, ignore_errors=True)
+        os.makedirs(YOUTUBE_DOWNLOADS_TMP_DIR, exist_ok=True)
+
+        try:
+            with open(YOUTUBE_DOWNLOADS_INDEX_PATH, 'r') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            index = {}
+        except ValueError as error:
+            log.warn(f'Invalid download cache index: {error}')
+            index = {}
+
+        cls.entries = {}
+
+        for video_id in os.listdir(YOUTUBE_DOWNLOADS_DIR):
+            file = cls.get_path(video_id)
+
+            if not path.isfile(file):
+                continue
+
+            entry = index.get(video_id, dict(last_access=path.getmtime(file), plays=0))
+            entry['size'] = path.getsize(file)
+            cls.entries[video_id] = entry
+
+        cls.size = sum(entry['size'] for entry in cls.entries.values())
+        log.info(f'Download cache has {len(cls.entries)} files ({cls.size / 1024 / 1024:.2f} MB)')
+
+        cls.evict()
+        cls.save()
+
+    @classmethod
+    def add(cls, video_id: str) -> None:
+        file = cls.get_path(video_id)
+
+        if not path.isfile(file):
+            return
+
+        entry = cls.entries.get(video_id)
+
+        if entry:
+            cls.size -= entry['size']
+        else:
+            entry = cls.entries[video_id] = dict(last_access=time(), added=time(), plays=0)
+
+        entry['size'] = path.getsize(file)
+        cls.size += entry['size']
+
+        cls.evict()
+        cls.save()
+
+    @classmethod
+    def touch(cls, video_id: str) -> None:
+        entry = cls.entries.get(video_id)
+
+        if entry is None:
+            return
+
+        entry['last_access'] = time()
+        entry['plays'] += 1
+        cls.save()
+
+    @classmethod
+    def evict(cls) -> None:
+        if cls.size <= cls.MAX_SIZE:
+            return
+
+        pinned = cls.get_pinned()
+        now = time()
+
+        def score(item):
+            if cls.POLICY == 'lfu':
+                return item[1]['plays'], item[1]['last_access']
+
+            return item[1]['last_access']
+
+        for video_id, entry in sorted(cls.entries.items(), key=score):
+            if cls.size <= cls.MAX_SIZE:
+                break
+
+            if video_id in pinned or now - entry.get('added', 0) < cls.GRACE_PERIOD:
+                continue
+
+            try:
+                os.remove(cls.get_path(video_id))
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                log.error(f'Failed to evict download {video_id}: {error}')
+                continue
+
+            del cls.entries[video_id]
+            cls.size -= entry['size']
+            log.info(f'Evicted download {video_id} ({entry["size"] / 1024 / 1024:.2f} MB)')
+
+        if cls.size > cls.MAX_SIZE:
+            log.warn(f'Download cache is over budget, {len(pinned)} queued tracks and new files are pinned')
+
+    @staticmethod
+    def get_pinned() -> Set[str]:
+        from neonbot.classes.player import Player
+
+        return {video_id for player in Player.servers.values() for video_id in player.queue.ids}
+
+    @staticmethod
+    def get_path(video_id: str) -> str:
+        return f'{YOUTUBE_DOWNLOADS_DIR}/{video_id}'
+
+    @classmethod
+    def save(cls) -> None:
+        try:
+            with open(YOUTUBE_DOWNLOADS_INDEX_PATH + '.tmp', 'w') as f:
+                json.dump(cls.entries, f)
+            os.replace(YOUTUBE_DOWNLOADS_INDEX_PATH + '.tmp', YOUTUBE_DOWNLOADS_INDEX_PATH)
+        except OSError as error:
+            log.error(f'Failed to write download cache index: {error}')
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, Optional, cast
+from typing import Any, Callable, Optional, cast
 
 import discord
 
@@ -55,6 +55,9 @@ class PaginationEmbed:
     previous, next and delete.
 
     You cannot control this after the timeout expires. Defaults to 60s
+
+    Instead of a list of embeds, pages can be rendered on demand by passing
+    get_page and get_page_count, so only the page being shown is ever built.
     """
 
     def __init__(
@@ -63,11 +66,16 @@ class PaginationEmbed:
         embeds=None,
         authorized_users: Optional[list] = None,
         timeout: Optional[int] = 60,
+        *,
+        get_page: Optional[Callable[[int], discord.Embed]] = None,
+        get_page_count: Optional[Callable[[], int]] = None,
     ) -> None:
         if embeds is None:
             embeds = []
         self.interaction = interaction
         self.embeds = embeds
+        self.get_page = get_page or (lambda index: self.embeds[index])
+        self.get_page_count = get_page_count or (lambda: len(self.embeds))
         self.authorized_users = authorized_users or []
         self.timeout = timeout
         self.title = None
@@ -81,12 +89,16 @@ class PaginationEmbed:
         await self.send()
 
     async def send(self) -> None:
+        page_count = self.get_page_count()
+        # Rendered pages can shrink while browsing
+        self.index = max(0, min(self.index, page_count - 1))
+
         embed = self.embed.copy()
-        embed.description = self.embeds[self.index].description
+        embed.description = self.get_page(self.index).description
         buttons = discord.utils.MISSING
 
-        if len(self.embeds) > 1:
-            embed.description += f'\n\n**Page {self.index + 1}/{len(self.embeds)}**'
+        if page_count > 1:
+            embed.description += f'\n\n**Page {self.index + 1}/{page_count}**'
             buttons = self.get_buttons()
 
         if not cast(discord.InteractionResponse, self.interaction.response).is_done():
@@ -117,10 +129,10 @@ class PaginationEmbed:
             self.index = 0
         elif cmd == 1 and self.index > 0:
             self.index -= 1
-        elif cmd == 2 and self.index < len(self.embeds) - 1:
+        elif cmd == 2 and self.index < self.get_page_count() - 1:
             self.index += 1
         elif cmd == 3:
-            self.index = len(self.embeds) - 1
+            self.index = self.get_page_count() - 1
 
 
 class EmbedChoices:
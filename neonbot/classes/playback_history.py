@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Iterable, Iterator, Optional
+
+from envparse import env
+
+from neonbot.classes.track import Track
+
+
+class PlaybackHistory:
+    """
+    The tracks a player has played, in order.
+
+    Positions keep counting up for the lifetime of the player while only the
+    latest MAX_SIZE tracks are kept, so old positions simply stop resolving.
+    Tracks are stored by reference and the queue looks up their index, so
+    removing a track from the queue doesn't need to rewrite the history.
+    """
+
+    MAX_SIZE = env.int('PLAYER_HISTORY_SIZE', default=500)
+
+    def __init__(self, tracks: Iterable[Track] = (), start: int = 0) -> None:
+        self.tracks: deque[Track] = deque(tracks, maxlen=PlaybackHistory.MAX_SIZE)
+        # Position of the oldest kept track
+        self.start = start
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.tracks)
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def __iter__(self) -> Iterator[Track]:
+        return iter(self.tracks)
+
+    def __getitem__(self, position: int) -> Track:
+        if not self.has(position):
+            raise IndexError(position)
+
+        return self.tracks[position - self.start]
+
+    def get(self, position: Optional[int]) -> Optional[Track]:
+        return self[position] if position is not None and self.has(position) else None
+
+    def has(self, position: int) -> bool:
+        return self.start <= position < self.end
+
+    def append(self, track: Track) -> None:
+        if len(self.tracks) == self.tracks.maxlen:
+            self.start += 1
+
+        self.tracks.append(track)
@@ -1,27 +1,33 @@
 from __future__ import annotations
 
 import asyncio
-import json
-import os
-import random
 from os import path
-from typing import Dict, List, Optional, Union
+from time import perf_counter, time
+from typing import Awaitable, Callable, List, Optional, Union
 
 import discord
 from discord.ext import commands, tasks
-from discord.utils import MISSING
 from envparse import env
 from i18n import t
 
 from neonbot import bot
+from neonbot.classes.autoplay_feed import AutoplayFeed
+from neonbot.classes.chained_source import ChainedSource
+from neonbot.classes.download_cache import DownloadCache
 from neonbot.classes.embed import Embed
+from neonbot.classes.playback_history import PlaybackHistory
 from neonbot.classes.player_controls import PlayerControls
+from neonbot.classes.player_journal import PlayerJournal
+from neonbot.classes.player_message import PlayerMessage
+from neonbot.classes.player_telemetry import PlayerTelemetry
+from neonbot.classes.shuffler import Shuffler
+from neonbot.classes.track import Track
+from neonbot.classes.track_queue import TrackQueue
 from neonbot.classes.ytdl import Ytdl
-from neonbot.classes.ytmusic import YTMusic
-from neonbot.enums import PlayerState, Repeat
+from neonbot.enums import ExtractPriority, PlayerState, Repeat
 from neonbot.models.guild import GuildModel
 from neonbot.utils import log
-from neonbot.utils.constants import FFMPEG_BEFORE_OPTIONS, FFMPEG_OPTIONS, ICONS, PLAYER_CACHE_PATH
+from neonbot.utils.constants import FFMPEG_BEFORE_OPTIONS, FFMPEG_OPTIONS, ICONS
 from neonbot.utils.exceptions import ApiError, PlayerError, YtdlError
 from neonbot.utils.functions import remove_ansi
 
@@ -29,6 +35,14 @@ from neonbot.utils.functions import remove_ansi
 class Player:
     servers: dict[int, Player] = {}
 
+    RESTORE_CONCURRENCY = env.int('PLAYER_RESTORE_CONCURRENCY', default=3)
+    # In seconds
+    RESTORE_CONNECT_INTERVAL = env.float('PLAYER_RESTORE_CONNECT_INTERVAL', default=1.5)
+    # Seconds before the end of a track to open the next one, 0 to disable gapless playback
+    PREROLL = env.float('PLAYER_PREROLL', default=5)
+    # Seconds between saves of the playback position
+    CHECKPOINT_INTERVAL = env.float('PLAYER_CHECKPOINT_INTERVAL', default=15)
+
     def __init__(self, ctx: commands.Context):
         self.ctx = ctx
         self.loop = asyncio.get_event_loop()
@@ -36,18 +50,26 @@ class Player:
         self.player_controls = PlayerControls(self)
         self.download = env.bool('YTDL_DOWNLOAD', default=False)
 
-        self.queue = []
+        self.queue = TrackQueue()
         self.current_track = 0
-        self.track_list = [0]
-        self.shuffled_list = []
-        self.messages: Dict[str, Optional[discord.Message]] = dict(
-            playing=None,
-            finished=None,
-        )
+        self.track_list = PlaybackHistory()
+        self.shuffler = Shuffler(on_change=self.record_shuffle)
+        self.message = PlayerMessage(self)
         self.last_track = None
         self.last_voice_channel: Optional[discord.VoiceChannel] = None
         self.state = PlayerState.NONE
         self.jump_to_track = None
+        self.prefetch_task: Optional[asyncio.Task] = None
+        self.prefetch_track: Optional[Track] = None
+        self.source: Optional[ChainedSource] = None
+        self.preroll_task: Optional[asyncio.Task] = None
+        # Where the next play() starts the current track, set by restores and reconnects
+        self.resume_position = 0
+        self.telemetry = PlayerTelemetry()
+        # The next source picks a track up again after an error or a reconnect
+        self.restarting = False
+        self.autoplay_feed = AutoplayFeed(self)
+        self.journal = PlayerJournal(ctx.guild.id, self.get_snapshot)
 
     @property
     def channel(self):
@@ -104,27 +126,68 @@ class Player:
         self.settings.music.autoplay = value
         self.loop.create_task(self.settings.save_changes())
 
+    @property
+    def following_index(self) -> int:
+        track = self.now_playing
+
+        # A removed track is placed where the track after it has taken over
+        return self.queue.index(track) + 1 if track in self.queue else self.queue.index(track)
+
     @property
     def is_last_track(self):
-        return self.track_list[self.current_track] == len(self.queue) - 1
+        return self.following_index >= len(self.queue)
 
     @property
-    def now_playing(self) -> Union[dict, None]:
-        try:
-            return {**self.queue[self.track_list[self.current_track]], 'index': self.track_list[self.current_track] + 1}
-        except IndexError:
-            return None
+    def now_playing(self) -> Optional[Track]:
+        return self.track_list.get(self.current_track)
 
-    @now_playing.setter
-    def now_playing(self, value) -> None:
-        try:
-            self.queue[self.track_list[self.current_track]] = value
-        except IndexError:
-            pass
+    @property
+    def position(self) -> float:
+        """Seconds played of the current track, counted from the frames sent to the voice client."""
 
-    def get_track(self, index: int) -> dict:
+        if self.source and self.source.track is self.now_playing:
+            return self.source.position
+
+        return self.resume_position
+
+    def get_track(self, index: int) -> Track:
         return self.queue[index]
 
+    def get_next_track(self) -> Optional[Track]:
+        """Predicts the track that after() will play next."""
+
+        if not self.queue or not self.now_playing:
+            return None
+
+        if self.state == PlayerState.JUMPED:
+            return self.track_list.get(self.jump_to_track)
+
+        if self.shuffle:
+            return self.shuffler.peek(self.queue, self.now_playing)
+
+        if self.repeat == Repeat.SINGLE and self.now_playing in self.queue:
+            return self.now_playing
+
+        if self.is_last_track:
+            return self.queue[0] if self.repeat == Repeat.ALL else None
+
+        return self.queue[self.following_index]
+
+    def get_upcoming_tracks(self, count: int) -> List[Track]:
+        """The predicted next track followed by the ones after the current track in queue order."""
+
+        if not self.now_playing:
+            return []
+
+        tracks = [self.get_next_track(), *self.queue[self.following_index : self.following_index + count]]
+
+        return list(dict.fromkeys(track for track in tracks if track))[:count]
+
+    @tasks.loop(seconds=CHECKPOINT_INTERVAL)
+    async def checkpoint(self) -> None:
+        if self.state == PlayerState.PLAYING:
+            self.record_position()
+
     @tasks.loop(count=1)
     async def reset_timeout(self, timeout=60) -> None:
         await asyncio.sleep(timeout)
@@ -147,6 +210,8 @@ class Player:
             self.last_voice_channel = channel
             await channel.connect(self_deaf=True)
 
+        self.journal.record('channel', channel_id=self.channel.id, voice_channel_id=self.last_voice_channel.id)
+
         log.cmd(self.ctx, t('music.player_connected', channel=self.last_voice_channel))
 
     async def disconnect(self, force=True, timeout=None) -> None:
@@ -156,32 +221,55 @@ class Player:
             except asyncio.TimeoutError:
                 pass
 
+    async def reconnect(self) -> None:
+        """Reconnects to the voice channel and picks the current track up where it was."""
+
+        position = self.position
+        self.cancel_preroll()
+        # The source that ends with the connection must not move on to the next track
+        self.source = None
+
+        await self.disconnect(force=True)
+        await self.connect()
+
+        # A stopped player starts its track over when played again, like it did before
+        if self.state in (PlayerState.PLAYING, PlayerState.PAUSED, PlayerState.AUTO_PAUSED):
+            self.resume_position = position
+
+        # Paused players stay paused and pick the track up once resumed
+        if self.state == PlayerState.PLAYING:
+            self.restarting = True
+            await self.play()
+
     async def set_repeat(self, mode: Repeat, requester: discord.User):
         self.repeat = mode.value
+        self.schedule_prefetch()
 
         msg = t('music.repeat_changed', mode=mode.name.lower(), user=requester.mention)
         await self.channel.send(embed=Embed(msg))
         log.cmd(self.ctx, msg, user=requester)
 
-        await self.refresh_player_message(embed=True)
+        await self.refresh_player_message()
 
     async def set_shuffle(self, requester: discord.User):
         self.shuffle = not self.shuffle
+        self.schedule_prefetch()
 
         msg = t('music.shuffle_changed', mode='on' if self.shuffle else 'off', user=requester.mention)
         await self.channel.send(embed=Embed(msg))
         log.cmd(self.ctx, msg, user=requester)
 
-        await self.refresh_player_message(embed=True)
+        await self.refresh_player_message()
 
     async def set_autoplay(self, requester: discord.User):
         self.autoplay = not self.autoplay
+        self.schedule_prefetch()
 
         msg = t('music.autoplay_changed', mode='on' if self.autoplay else 'off', user=requester.mention)
         await self.channel.send(embed=Embed(msg))
         log.cmd(self.ctx, msg, user=requester)
 
-        await self.refresh_player_message(embed=True)
+        await self.refresh_player_message()
 
     async def pause(self, requester: discord.User, auto=False):
         if self.connection.is_paused() or not self.connection.is_playing():
@@ -191,18 +279,25 @@ class Player:
         log.cmd(self.ctx, t('music.player_paused', user=requester.name))
 
         self.state = PlayerState.AUTO_PAUSED if auto else PlayerState.PAUSED
+        self.record_position()
 
         await self.channel.send(embed=Embed(t('music.player_paused', user=requester.mention)))
         await self.refresh_player_message()
 
     async def resume(self, requester: discord.User):
-        if not self.connection.is_paused():
+        if self.connection.is_paused():
+            self.connection.resume()
+        elif self.state in (PlayerState.PAUSED, PlayerState.AUTO_PAUSED) and not self.connection.is_playing():
+            # Paused across a reconnect, which left no source to resume
+            self.restarting = True
+            await self.play()
+        else:
             return
 
-        self.connection.resume()
         log.cmd(self.ctx, t('music.player_resumed', user=requester.name))
 
         self.state = PlayerState.PLAYING
+        self.record_position()
 
         await self.channel.send(embed=Embed(t('music.player_resumed', user=requester.mention)))
         await self.refresh_player_message()
@@ -212,19 +307,37 @@ class Player:
             return
 
         try:
-            if not self.now_playing.get('stream') or Ytdl.is_expired(self.now_playing['stream']):
-                ytdl_info = await Ytdl().extract_info(self.now_playing['url'])
-                info = ytdl_info.get_track()
-                self.now_playing = {'index': self.track_list[self.current_track] + 1, **self.now_playing, **info}
-
-            source = discord.FFmpegOpusAudio(
-                self.now_playing['stream'],
-                before_options=None if self.download else FFMPEG_BEFORE_OPTIONS,
-                # before_options=FFMPEG_BEFORE_OPTIONS,
-                options=FFMPEG_OPTIONS,
+            track = self.now_playing
+
+            # Joins an in-flight prefetch of the track and raises it to playback priority
+            if not self.is_stream_valid(track):
+                await self.resolve_track(track, ExtractPriority.PLAYBACK)
+
+            if self.download:
+                DownloadCache.touch(track.id)
+
+            offset = 0 if track.is_live else self.resume_position
+            self.resume_position = 0
+            restart, self.restarting = self.restarting, False
+
+            source = self.source = ChainedSource(
+                self.create_source(track, offset, restart=restart),
+                track,
+                loop=self.loop,
+                preroll=Player.PREROLL,
+                on_preroll=self.schedule_preroll,
+                on_switch=lambda: self.loop.create_task(self.after_switch()),
+                offset=offset,
+                telemetry=self.telemetry,
             )
-            self.connection.play(source, after=lambda e: self.loop.create_task(self.after(error=e)))
+            self.connection.play(source, after=lambda e: self.loop.create_task(self.after(error=e, source=source)))
             self.state = PlayerState.PLAYING
+            self.record_position()
+            self.schedule_prefetch()
+
+            if not self.checkpoint.is_running():
+                self.checkpoint.start()
+
             await self.send_playing_message()
 
         except Exception as error:
@@ -238,13 +351,59 @@ class Player:
 
             log.exception(msg, error)
             await self.channel.send(embed=Embed(remove_ansi(msg)).set_author(self.now_playing.get('title')))
+            self.restarting = True
             self.loop.create_task(self.after())
 
-    async def after(self, error=None):
+    def create_source(self, track: Track, offset: float = 0, *, restart: bool = False) -> discord.FFmpegOpusAudio:
+        self.telemetry.source_created(restart)
+        before_options = [] if self.download else [FFMPEG_BEFORE_OPTIONS]
+
+        # Seeking on the input skips straight to the offset instead of decoding up to it
+        if offset:
+            before_options.append(f'-ss {offset:.2f}')
+
+        return discord.FFmpegOpusAudio(
+            track.stream,
+            before_options=' '.join(before_options) or None,
+            # before_options=FFMPEG_BEFORE_OPTIONS,
+            options=FFMPEG_OPTIONS,
+            # Opus is copied straight into the voice stream, anything else is transcoded
+            codec=track.codec,
+        )
+
+    async def after_switch(self):
+        """Catches up with the source after it moved on to the pre-rolled track by itself."""
+
+        self.last_track = self.now_playing
+        track = self.source.track
+
+        # Same bookkeeping as after(), which only queues a pre-roll for the track it would pick
+        if self.shuffle:
+            self.shuffler.advance(self.queue, self.now_playing)
+
+        if self.shuffle or not (self.repeat == Repeat.SINGLE and track is self.now_playing):
+            self.append_history(track)
+            self.current_track += 1
+
+        await self.send_finished_message()
+
+        if self.download:
+            DownloadCache.touch(track.id)
+
+        self.state = PlayerState.PLAYING
+        self.record_position()
+        self.schedule_prefetch()
+        await self.send_playing_message()
+
+    async def after(self, error=None, source: Optional[ChainedSource] = None):
         if error:
             log.error(error)
             return
 
+        # A source that was replaced, e.g. by a reconnect, has nothing left to say
+        if source and source is not self.source:
+            return
+
         self.last_track = self.now_playing
 
         if self.state == PlayerState.NONE:
@@ -263,7 +422,7 @@ class Player:
                 self.process_shuffle()
 
             # If repeat is on SINGLE
-            elif self.repeat == Repeat.SINGLE:
+            elif self.repeat == Repeat.SINGLE and self.now_playing in self.queue:
                 await self.send_finished_message()
                 await self.play()
                 return
@@ -275,95 +434,211 @@ class Player:
                         await self.send_finished_message()
                         await self.process_autoplay()
                     except ApiError:
+                        # Nothing comes next, so the record of the last track replaces its controls
+                        self.message.request('finished')
                         return
                 else:
                     await self.send_finished_message(detailed=True)
                     self.state = PlayerState.STOPPED
+                    self.record_position()
                     return
 
             # If last track and repeat is ALL
             elif self.is_last_track and self.repeat == Repeat.ALL:
                 await self.send_finished_message()
-                self.track_list.append(0)
+                self.append_history(self.queue[0])
 
             else:
                 await self.send_finished_message()
-                self.track_list.append(self.track_list[self.current_track] + 1)
+                self.append_history(self.queue[self.following_index])
 
             self.current_track += 1
 
         self.loop.create_task(self.play())
 
     def next(self):
+        self.cancel_preroll()
         self.connection.stop()
 
     def jump(self, index):
-        self.track_list.append(index)
+        self.append_history(self.queue[index])
         self.jump_to_track = self.current_track + 1
         self.state = PlayerState.JUMPED
-        self.connection.stop()
+        self.schedule_prefetch()
+        self.next()
 
     async def reset(self, timeout=None, clear_cache=True):
         self.state = PlayerState.NONE
+        self.checkpoint.cancel()
+        self.cancel_prefetch()
+        self.cancel_preroll()
+        self.autoplay_feed.clear()
         await self.disconnect(force=True, timeout=timeout)
         await self.clear_messages()
+        self.message.close()
         if clear_cache:
             self.delete_cache()
-        self.queue = []
+        self.queue = TrackQueue()
+        self.current_track = 0
+        self.track_list = PlaybackHistory()
+        self.shuffler = Shuffler(on_change=self.record_shuffle)
         self.player_controls = None
 
     async def stop(self):
         await self.clear_messages()
         self.state = PlayerState.STOPPED
+        self.record_position()
+        self.cancel_prefetch()
+        self.cancel_preroll()
         self.next()
 
     async def remove_song(self, index: int):
-        self.queue.pop(index)
-
-        if len(self.track_list) > 0:
-            for i, track in enumerate(self.track_list):
-                if track > index:
-                    self.track_list[i] -= 1
+        track = self.queue.pop(index)
+        self.shuffler.remove(track)
+        self.journal.record('remove', index=index)
 
         # if current track is playing now
-        if self.track_list[self.current_track] == index:
-            self.current_track -= 1
+        if track is self.now_playing:
             self.state = PlayerState.REMOVED
             self.next()
+        elif self.now_playing and self.queue.index(self.now_playing) >= index:
+            await self.refresh_player_message()
 
-        if self.track_list[self.current_track] > index:
-            self.current_track -= 1
-            await self.refresh_player_message(embed=True)
+        self.schedule_prefetch()
 
     def process_shuffle(self) -> None:
-        def choices():
-            return [x for x in range(0, len(self.queue)) if x not in self.shuffled_list]
+        track = self.shuffler.advance(self.queue, self.now_playing)
+        self.append_history(track)
 
-        if len(self.queue) == 1:
-            self.shuffled_list = []
-        elif len(self.shuffled_list) == 0 or len(choices()) == 0:
-            self.shuffled_list = [self.track_list[self.current_track]]
-            return self.process_shuffle()
+    def append_history(self, track: Track) -> None:
+        self.track_list.append(track)
+        self.journal.record('history', index=self.queue.index(track))
 
-        index = random.choice(choices())
-        self.shuffled_list.append(index)
-        self.track_list.append(index)
+    def record_shuffle(self, op: str, tracks: List[Track]) -> None:
+        self.journal.record('shuffle_' + op, indices=[self.queue.index(track) for track in tracks])
 
-    async def process_autoplay(self) -> None:
-        related_video_id = await YTMusic().get_related_video(
-            self.now_playing, playlist=list(map(lambda track: track['id'], self.queue))
+    def record_position(self) -> None:
+        self.journal.record(
+            'position', current_track=self.current_track, position=round(self.position, 2), state=self.state.value
         )
 
-        if not related_video_id:
+    def is_stream_valid(self, track: Track) -> bool:
+        if not track.stream:
+            return False
+
+        # Downloaded files may have been evicted since the track was resolved
+        if self.download:
+            return path.exists(track.stream)
+
+        return not Ytdl.is_expired(track.stream)
+
+    async def resolve_track(self, track: Track, priority: ExtractPriority) -> Track:
+        start_time = perf_counter()
+        ytdl_info = await Ytdl().extract_info(track.url, priority=priority)
+        self.telemetry.extract.add(perf_counter() - start_time)
+
+        # Stubs are promoted in place so every reference to the track sees the details
+        self.queue.update(track, ytdl_info.get_track())
+
+        return track
+
+    def schedule_prefetch(self) -> None:
+        """Resolves the stream of the next track in the background while the current one plays."""
+
+        if not self.connection:
+            return
+
+        track = self.get_next_track()
+
+        # A pre-rolled track that is no longer next is dropped, the player changed its mind
+        if self.source and self.source.next_track and self.source.next_track is not track:
+            self.cancel_preroll()
+
+        if self.prefetch_task and not self.prefetch_task.done():
+            if track is self.prefetch_track:
+                return
+            self.prefetch_task.cancel()
+
+        self.prefetch_task = None
+        self.prefetch_track = track
+
+        # The last track is followed by an autoplay pick, get it ready instead
+        if track is None and self.autoplay and self.repeat == Repeat.OFF and self.now_playing:
+            self.autoplay_feed.prepare(self.now_playing)
+
+        if track is None or self.is_stream_valid(track):
+            return
+
+        self.prefetch_task = self.loop.create_task(self.prefetch(track))
+
+    def cancel_prefetch(self) -> None:
+        if self.prefetch_task and not self.prefetch_task.done():
+            self.prefetch_task.cancel()
+
+        self.prefetch_task = None
+        self.prefetch_track = None
+
+    def schedule_preroll(self) -> None:
+        if self.state != PlayerState.PLAYING or (self.preroll_task and not self.preroll_task.done()):
+            return
+
+        self.preroll_task = self.loop.create_task(self.preroll())
+
+    async def preroll(self) -> None:
+        """Opens the next track before the current one ends so the source can switch to it without a gap."""
+
+        track = self.get_next_track()
+        source = self.source
+
+        if not track or track.is_live or not source:
+            return
+
+        if not self.is_stream_valid(track):
+            # Joins an in-flight prefetch of the track and raises it to playback priority
+            try:
+                await self.resolve_track(track, ExtractPriority.PLAYBACK)
+            except YtdlError as error:
+                log.warn(f'Failed to pre-roll {track.title}: {error}')
+                return
+
+        # Anything that changed the next track while waiting has already moved on without us
+        if (
+            self.source is not source
+            or not self.connection
+            or not self.connection.is_playing()
+            or self.get_next_track() is not track
+            or not self.is_stream_valid(track)
+        ):
+            return
+
+        source.queue(self.create_source(track), track)
+        log.info(f'Pre-rolled next track: {track.title}')
+
+    def cancel_preroll(self) -> None:
+        if self.preroll_task and not self.preroll_task.done():
+            self.preroll_task.cancel()
+
+        self.preroll_task = None
+
+        if self.source:
+            self.source.cancel_next()
+
+    async def prefetch(self, track: Track) -> None:
+        try:
+            await self.resolve_track(track, ExtractPriority.PREFETCH)
+            log.info(f'Prefetched next track: {track.title}')
+        except YtdlError as error:
+            log.warn(f'Prefetch failed for {track.title}: {error}')
+
+    async def process_autoplay(self) -> None:
+        data = await self.autoplay_feed.next(self.now_playing)
+
+        if not data:
             await self.ctx.channel.send(embed=Embed(t('music.no_related_video_found')))
             raise ApiError('No related video found.')
 
-        ytdl_info = await Ytdl().extract_info('https://www.youtube.com/watch?v=' + related_video_id)
-        data = ytdl_info.get_track()
-
-        if data:
-            self.add_to_queue(data, requested=bot.user)
-            self.track_list.append(self.track_list[self.current_track] + 1)
+        self.add_to_queue(data, requested=bot.user)
+        self.append_history(self.queue[self.following_index])
 
     async def send_playing_message(self) -> None:
         if not self.now_playing:
@@ -373,12 +648,7 @@ class Player:
             self.ctx, t('music.now_playing.title', title=self.now_playing['title']), user=self.now_playing['requested']
         )
 
-        await self.clear_messages()
-        self.player_controls.initialize()
-
-        self.messages['playing'] = await self.channel.send(
-            embed=self.get_playing_embed(), view=self.player_controls.get(), silent=True
-        )
+        self.message.request('playing')
 
     async def send_finished_message(self, detailed=False) -> None:
         log.cmd(
@@ -387,43 +657,15 @@ class Player:
             user=self.last_track['requested'],
         )
 
-        await self.clear_messages()
-        self.player_controls.initialize()
-
-        message = await self.channel.send(
-            embed=self.get_finished_embed() if detailed else self.get_simplified_finished_message(),
-            view=self.player_controls.get() if detailed else None,
-            silent=True,
-        )
-
-        # Will replace by simplified after
+        # Between tracks the record is left behind once the next track shows up
         if detailed:
-            self.messages['finished'] = message
+            self.message.request('finished')
 
     async def clear_messages(self):
-        if self.messages['finished']:
-            await bot.delete_message(self.messages['finished'])
-            await self.channel.send(embed=self.get_simplified_finished_message(), silent=True)
-
-        await bot.delete_message(self.messages['playing'])
-        self.messages['playing'] = None
-        self.messages['finished'] = None
-
-    async def refresh_player_message(self, *, embed=False):
-        self.player_controls.refresh()
-
-        if self.messages['playing']:
-            await bot.edit_message(
-                self.messages['playing'],
-                embed=self.get_playing_embed() if embed else MISSING,
-                view=self.player_controls.get(),
-            )
-        elif self.messages['finished']:
-            await bot.edit_message(
-                self.messages['finished'],
-                embed=self.get_finished_embed() if embed else MISSING,
-                view=self.player_controls.get(),
-            )
+        await self.message.clear()
+
+    async def refresh_player_message(self):
+        self.message.request('refresh')
 
     def get_footer(self, now_playing):
         return [
@@ -436,13 +678,13 @@ class Player:
 
     def get_playing_embed(self):
         return self.get_track_embed(self.now_playing).set_author(
-            name=t('music.now_playing.index', index=self.now_playing['index']),
+            name=t('music.now_playing.index', index=self.queue.index(self.now_playing) + 1),
             icon_url=ICONS['music'],
         )
 
     def get_finished_embed(self):
         return self.get_track_embed(self.last_track).set_author(
-            name=t('music.finished_playing.index', index=self.last_track['index']),
+            name=t('music.finished_playing.index', index=self.queue.index(self.last_track) + 1),
             icon_url=ICONS['music'],
         )
 
@@ -453,95 +695,146 @@ class Player:
 
         return embed
 
-    def get_simplified_finished_message(self):
-        title = self.last_track['title']
-        url = self.last_track['url']
+    def get_simplified_finished_message(self, track: Optional[Track] = None):
+        track = track or self.last_track
+        title = track['title']
+        url = track['url']
 
         formatted_title = f'[{title}]({url})' if url else title
 
-        return Embed(f'{t("music.finished_playing.index", index=self.last_track["index"])}: {formatted_title}')
+        return Embed(f'{t("music.finished_playing.index", index=self.queue.index(track) + 1)}: {formatted_title}')
 
     @staticmethod
     def has_cache(guild_id):
-        file = PLAYER_CACHE_PATH % guild_id
-        return path.exists(file)
+        return PlayerJournal.exists(guild_id)
 
     @staticmethod
-    async def load_cache(guild_id):
-        file = PLAYER_CACHE_PATH % guild_id
+    async def load_all_cache(guild_ids: List[int]) -> None:
+        """
+        Restores the saved players a few at a time, starting with the ones that were playing.
+        Voice connects are spaced out so a restart doesn't connect every guild at once.
+        """
 
-        try:
-            with open(file, 'r') as f:
+        start_time = time()
+        caches = []
+
+        for guild_id in guild_ids:
+            journal = PlayerJournal(guild_id)
+            cache = journal.load()
+
+            if cache:
+                caches.append((guild_id, cache))
+            else:
+                journal.delete()
+
+        caches.sort(key=lambda item: item[1]['state'] != PlayerState.PLAYING.value)
+
+        semaphore = asyncio.Semaphore(Player.RESTORE_CONCURRENCY)
+        connect_lock = asyncio.Lock()
+        last_connect = dict(time=0.0)
 
-                def map_queue(track):
-                    track['requested'] = bot.get_user(track['requested'])
-                    return track
+        async def wait_connect_turn():
+            async with connect_lock:
+                delay = last_connect['time'] + Player.RESTORE_CONNECT_INTERVAL - time()
 
-                cache = json.load(f)
-                channel = bot.get_channel(cache['channel_id'])
+                if delay > 0:
+                    await asyncio.sleep(delay)
 
-                if not channel:
-                    raise PlayerError("Can't find channel.")
+                last_connect['time'] = time()
 
-                origin = await channel.send(embed=Embed('Picking up where you left off...'))
+        async def restore(guild_id, cache):
+            async with semaphore:
+                return await Player.load_cache(guild_id, cache, before_connect=wait_connect_turn)
 
-                player = await Player.get_instance(origin)
-                player.queue = list(map(map_queue, cache['queue']))
-                player.current_track = cache['current_track']
-                player.track_list = cache['track_list']
-                player.shuffled_list = cache['shuffled_list']
-                player.state = PlayerState.get_by_value(cache['state'])
-                player.last_voice_channel = bot.get_channel(cache['voice_channel_id'])
+        results = await asyncio.gather(*[restore(guild_id, cache) for guild_id, cache in caches])
 
-                if player.state == PlayerState.PLAYING:
-                    await player.connect()
-                    await player.play()
+        log.info(f'Restored {results.count(True)} of {len(caches)} players in {time() - start_time:.2f}s')
 
+    @staticmethod
+    async def load_cache(
+        guild_id: int, cache: dict, *, before_connect: Optional[Callable[[], Awaitable]] = None
+    ) -> bool:
+        # A session started while restores were still trickling in is newer than the saved one
+        if guild_id in Player.servers:
+            log.info(f'Skipped restoring player of {guild_id}, a new session already started')
+            return False
+
+        try:
+            channel = bot.get_channel(cache['channel_id'])
+
+            if not channel:
+                raise PlayerError("Can't find channel.")
+
+            log.info(f'Loading player cache on {channel.guild} ({guild_id})...')
+
+            origin = await channel.send(embed=Embed('Picking up where you left off...'))
+
+            if guild_id in Player.servers:
                 await origin.delete()
+                log.info(f'Skipped restoring player of {guild_id}, a new session already started')
+                return False
+
+            player = await Player.get_instance(origin)
+            player.queue = TrackQueue(map(Track.from_dict, cache['queue']))
+            player.track_list = PlaybackHistory(
+                (player.queue[min(index, len(player.queue) - 1)] for index in cache['track_list']),
+                start=cache['history_start'],
+            )
+            player.current_track = cache['current_track']
+            player.resume_position = cache['position']
+            player.shuffler.load(player.queue[index] for index in cache['shuffle_remaining'])
+            player.state = PlayerState.get_by_value(cache['state']) or PlayerState.NONE
+            player.last_voice_channel = bot.get_channel(cache['voice_channel_id'])
+            player.journal.save()
+
+            if player.state == PlayerState.PLAYING:
+                if before_connect:
+                    await before_connect()
+
+                await player.connect()
+                # Streams still in the extraction cache are reused instead of extracted again
+                await player.play()
+
+            await origin.delete()
+
+            return True
         except Exception as error:
             log.error(error)
-        finally:
-            os.remove(file)
+            PlayerJournal(guild_id).delete()
+
+            return False
+
+    def get_telemetry(self) -> dict:
+        return dict(
+            guild_id=self.ctx.guild.id,
+            guild=str(self.ctx.guild),
+            state=self.state.name.lower(),
+            track=self.now_playing.title if self.now_playing else None,
+            **self.telemetry.sample(self.source.source if self.source else None),
+            **self.telemetry.to_dict(),
+        )
+
+    def get_snapshot(self) -> dict:
+        return dict(
+            channel_id=self.channel.id,
+            voice_channel_id=self.last_voice_channel.id if self.last_voice_channel else None,
+            queue=[track.to_dict() for track in self.queue],
+            history_start=self.track_list.start,
+            track_list=[self.queue.index(track) for track in self.track_list],
+            current_track=self.current_track,
+            position=round(self.position, 2),
+            shuffle_remaining=[self.queue.index(track) for track in self.shuffler.unplayed],
+            state=self.state.value,
+        )
 
     def save_cache(self):
         if len(self.queue) == 0:
             return
 
-        file = PLAYER_CACHE_PATH % self.ctx.guild.id
-
-        with open(file, 'w') as f:
-
-            def map_queue(track):
-                if hasattr(track['requested'], 'id'):
-                    track['requested'] = track['requested'].id
-                track['stream'] = None
-                return track
-
-            # noinspection PyTypeChecker
-            json.dump(
-                {
-                    'voice_channel_id': self.last_voice_channel.id,
-                    'channel_id': self.ctx.channel.id,
-                    'queue': list(map(map_queue, self.queue)),
-                    'current_track': self.current_track,
-                    'track_list': self.track_list,
-                    'shuffled_list': self.shuffled_list,
-                    'state': self.state.value,
-                },
-                f,
-                indent=4,
-            )
+        self.journal.save()
 
     def delete_cache(self):
-        file = PLAYER_CACHE_PATH % self.ctx.guild.id
-
-        if not self.has_cache(self.ctx.guild.id):
-            return
-
-        try:
-            os.remove(file)
-        except Exception as error:
-            log.error(error)
+        self.journal.delete()
 
     def add_to_queue(self, data: Union[List, dict], *, requested: discord.User = None) -> None:
         if not data:
@@ -550,9 +843,19 @@ class Player:
         if not isinstance(data, list):
             data = [data]
 
-        for info in data:
-            info['requested'] = requested
-            self.queue.append(info)
+        tracks = [Track(info, requested=requested) for info in data]
+
+        for track in tracks:
+            self.queue.append(track)
+            self.shuffler.add(track)
+
+        self.journal.record('add', tracks=[track.to_dict() for track in tracks])
+
+        # The first queued track is the one the player starts with
+        if not self.track_list:
+            self.append_history(tracks[0])
+
+        self.schedule_prefetch()
 
         # Update next button
         if self.player_controls.next_disabled:
@@ -27,7 +27,7 @@ class PlayerControls:
         else:
             views[0].style = discord.ButtonStyle.secondary
 
-        views[1].disabled = not (0 <= self.player.current_track - 1 < len(self.player.track_list))
+        views[1].disabled = not self.player.track_list.has(self.player.current_track - 1)
 
         if self.player.connection and self.player.connection.is_playing():
             views[2].emoji = '⏸️'
@@ -73,10 +73,11 @@ class PlayerControls:
                 return
 
         if button.emoji.name == '▶️':  # play
-            if self.player.connection.is_paused():
+            # A reconnect leaves a paused player without a paused source
+            if self.player.connection.is_paused() or self.player.state in (PlayerState.PAUSED, PlayerState.AUTO_PAUSED):
                 await self.player.resume(requester=interaction.user)
             else:
-                self.player.current_track = 0
+                self.player.current_track = self.player.track_list.start
                 await self.player.play()
         elif button.emoji.name == '⏸️':  # pause
             await self.player.pause(requester=interaction.user)
@@ -98,7 +99,7 @@ class PlayerControls:
             )
 
             if self.player.connection.is_playing():
-                if self.player.current_track != len(self.player.track_list) - 1:
+                if self.player.current_track != self.player.track_list.end - 1:
                     self.player.jump_to_track = self.player.current_track + 1
                     self.player.state = PlayerState.JUMPED
 
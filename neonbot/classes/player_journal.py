@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import pickle
+import threading
+from os import path
+from typing import Callable, Optional
+
+from envparse import env
+
+from neonbot.classes.playback_history import PlaybackHistory
+from neonbot.utils import log
+from neonbot.utils.constants import PLAYER_JOURNAL_PATH, PLAYER_SNAPSHOT_PATH
+
+
+class PlayerJournal:
+    """
+    Keeps the state of a player on disk as it changes.
+
+    Every queue and position change is appended to a journal as soon as it
+    happens, and the journal is compacted every now and then into a snapshot
+    that is written off the event loop and swapped in by an atomic rename.
+    Loading replays the journal on top of the snapshot, so a crash loses nothing.
+    Saves and deletes start a new generation, which a compaction still writing
+    from an older one never overwrites.
+    """
+
+    COMPACT_EVERY = env.int('PLAYER_JOURNAL_COMPACT_EVERY', default=500)
+
+    def __init__(self, guild_id: int, snapshot: Optional[Callable[[], dict]] = None) -> None:
+        self.guild_id = guild_id
+        self.snapshot = snapshot
+        self.seq = 0
+        self.entries = 0
+        self.opened = False
+        self.compact_task: Optional[asyncio.Task] = None
+        # Guards the snapshot file against the compaction thread
+        self.lock = threading.Lock()
+        self.generation = 0
+
+    @property
+    def journal_path(self) -> str:
+        return PLAYER_JOURNAL_PATH % self.guild_id
+
+    @property
+    def snapshot_path(self) -> str:
+        return PLAYER_SNAPSHOT_PATH % self.guild_id
+
+    @staticmethod
+    def exists(guild_id: int) -> bool:
+        return path.exists(PLAYER_SNAPSHOT_PATH % guild_id) or path.exists(PLAYER_JOURNAL_PATH % guild_id)
+
+    def record(self, op: str, **data) -> None:
+        # Leftovers of a previous session that weren't restored would be replayed under ours
+        if not self.opened:
+            self.delete()
+            self.opened = True
+
+        self.seq += 1
+
+        try:
+            with open(self.journal_path, 'a') as f:
+                f.write(json.dumps({'seq': self.seq, 'op': op, **data}) + '\n')
+        except OSError as error:
+            log.error(f'Failed to write player journal for {self.guild_id}: {error}')
+            return
+
+        self.entries += 1
+
+        if self.entries >= self.COMPACT_EVERY and not (self.compact_task and not self.compact_task.done()):
+            self.compact_task = asyncio.get_event_loop().create_task(self.compact())
+
+    async def compact(self) -> None:
+        seq, generation = self.seq, self.generation
+        snapshot = {**self.snapshot(), 'seq': seq}
+
+        written = await asyncio.get_event_loop().run_in_executor(None, self.write_snapshot, snapshot, generation)
+
+        # Entries recorded while writing are newer than the snapshot and are kept until the next compaction
+        if written and self.seq == seq and self.generation == generation:
+            self.truncate()
+
+    def save(self) -> None:
+        """Compacts right away without leaving the event loop, for shutdown and right after a restore."""
+
+        self.opened = True
+
+        with self.lock:
+            self.generation += 1
+
+        if self.write_snapshot({**self.snapshot(), 'seq': self.seq}, self.generation):
+            self.truncate()
+
+    def write_snapshot(self, snapshot: dict, generation: int) -> bool:
+        file = self.snapshot_path
+
+        with self.lock:
+            # A save or delete since the snapshot was taken already left newer state on disk
+            if generation != self.generation:
+                return False
+
+            try:
+                with open(file + '.tmp', 'wb') as f:
+                    pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(file + '.tmp', file)
+            except OSError as error:
+                log.error(f'Failed to write player snapshot for {self.guild_id}: {error}')
+                return False
+
+        return True
+
+    def truncate(self) -> None:
+        try:
+            open(self.journal_path, 'w').close()
+        except OSError as error:
+            log.error(f'Failed to truncate player journal for {self.guild_id}: {error}')
+            return
+
+        self.entries = 0
+
+    def delete(self) -> None:
+        with self.lock:
+            self.generation += 1
+
+            for file in (self.snapshot_path, self.journal_path):
+                try:
+                    os.remove(file)
+                except FileNotFoundError:
+                    pass
+                except OSError as error:
+                    log.error(error)
+
+    def load(self) -> Optional[dict]:
+        """Returns the last saved state of the player, or None if nothing was saved."""
+
+        state = dict(
+            seq=0,
+            channel_id=None,
+            voice_channel_id=None,
+            queue=[],
+            history_start=0,
+            track_list=[],
+            current_track=0,
+            position=0,
+            shuffle_remaining=[],
+            state=None,
+        )
+
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                state.update(pickle.load(f))
+        except FileNotFoundError:
+            pass
+        except (pickle.UnpicklingError, EOFError, ValueError) as error:
+            log.warn(f'Invalid player snapshot for {self.guild_id}: {error}')
+
+        try:
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash is the last one written
+                        break
+
+                    if entry['seq'] > state['seq']:
+                        self.replay(state, entry)
+                        state['seq'] = entry['seq']
+        except FileNotFoundError:
+            pass
+
+        self.seq = state['seq']
+        self.opened = True
+
+        return state if state['queue'] else None
+
+    @staticmethod
+    def replay(state: dict, entry: dict) -> None:
+        op = entry['op']
+
+        if op == 'channel':
+            state['channel_id'] = entry['channel_id']
+            state['voice_channel_id'] = entry['voice_channel_id']
+
+        elif op == 'add':
+            # Mirrors Shuffler.add, which leaves new tracks to the next cycle once one is over
+            if state['shuffle_remaining']:
+                start = len(state['queue'])
+                state['shuffle_remaining'].extend(range(start, start + len(entry['tracks'])))
+
+            state['queue'].extend(entry['tracks'])
+
+        elif op == 'remove':
+            index = entry['index']
+            state['queue'].pop(index)
+            # Played entries of the removed track point to the track that took its place, like TrackQueue.index
+            state['track_list'] = [i - 1 if i > index else i for i in state['track_list']]
+            state['shuffle_remaining'] = [i - 1 if i > index else i for i in state['shuffle_remaining'] if i != index]
+
+        elif op == 'history':
+            state['track_list'].append(entry['index'])
+
+            overflow = len(state['track_list']) - PlaybackHistory.MAX_SIZE
+
+            if overflow > 0:
+                del state['track_list'][:overflow]
+                state['history_start'] += overflow
+
+        elif op == 'shuffle_refill':
+            state['shuffle_remaining'] = list(entry['indices'])
+
+        elif op == 'shuffle_advance':
+            state['shuffle_remaining'] = [i for i in state['shuffle_remaining'] if i not in entry['indices']]
+
+        elif op == 'position':
+            state['current_track'] = entry['current_track']
+            state['position'] = entry.get('position', 0)
+            state['state'] = entry['state']
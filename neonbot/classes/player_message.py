@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from time import time
+from typing import TYPE_CHECKING, Deque, Dict, Optional
+
+import discord
+
+from neonbot import bot
+from neonbot.classes.track import Track
+from neonbot.utils import log
+
+if TYPE_CHECKING:
+    from neonbot.classes.player import Player
+
+
+class PlayerMessage:
+    """
+    The message that shows what a player is doing.
+
+    Updates are debounced and only the latest one is rendered, so rapid skips
+    and toggles collapse into a single call. The message is edited in place while
+    it's still the latest one in the channel, a finished track is left behind as
+    a one line record, and calls are held back to stay within the channel's
+    rate limit.
+    """
+
+    # In seconds
+    DEBOUNCE = 0.5
+    # Discord allows about 5 message operations per 5 seconds on a channel
+    RATE_LIMIT = 5
+    RATE_PERIOD = 5
+
+    # Times of the latest calls per channel, shared by every player
+    calls: Dict[int, Deque[float]] = {}
+
+    def __init__(self, player: Player) -> None:
+        self.player = player
+        self.message: Optional[discord.Message] = None
+        # Either playing or finished
+        self.kind: Optional[str] = None
+        self.track: Optional[Track] = None
+        self.pending: Optional[str] = None
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def request(self, kind: str) -> None:
+        """Queues an update, replacing any that hasn't been rendered yet."""
+
+        # A refresh is already covered by any other pending render
+        if kind == 'refresh' and self.pending:
+            return
+
+        self.pending = kind
+        self.wake.set()
+
+        if not self.task or self.task.done():
+            self.task = self.player.loop.create_task(self.run())
+
+    async def run(self) -> None:
+        while True:
+            await self.wake.wait()
+            await asyncio.sleep(self.DEBOUNCE)
+            self.wake.clear()
+
+            kind, self.pending = self.pending, None
+
+            if not kind:
+                continue
+
+            try:
+                await self.render(kind)
+            except Exception as error:
+                log.error(f'Failed to update player message: {error}')
+
+    async def render(self, kind: str) -> None:
+        player = self.player
+
+        if not player.player_controls:
+            return
+
+        if kind == 'playing':
+            track = player.now_playing
+
+            if not track:
+                return
+
+            player.player_controls.initialize()
+            embed, view = player.get_playing_embed(), player.player_controls.get()
+
+            # Replays of the same track keep the message, a new track leaves a record of the last one behind
+            if self.message and self.track is track and self.is_latest():
+                await self.edit(embed=embed, view=view)
+            else:
+                await self.finish()
+                await self.send(embed=embed, view=view)
+
+            self.kind, self.track = 'playing', track
+
+        elif kind == 'finished':
+            player.player_controls.initialize()
+            embed, view = player.get_finished_embed(), player.player_controls.get()
+
+            if self.message and self.is_latest():
+                await self.edit(embed=embed, view=view)
+            else:
+                await self.finish()
+                await self.send(embed=embed, view=view)
+
+            self.kind, self.track = 'finished', player.last_track
+
+        elif kind == 'refresh' and self.message:
+            player.player_controls.refresh()
+            embed = player.get_playing_embed() if self.kind == 'playing' else player.get_finished_embed()
+
+            await self.edit(embed=embed, view=player.player_controls.get())
+
+    async def clear(self) -> None:
+        """Retires the message right away, dropping any pending update."""
+
+        self.pending = None
+
+        if self.kind == 'finished':
+            await self.finish()
+        elif self.message:
+            await self.throttle()
+            await bot.delete_message(self.message)
+
+        self.message = self.kind = self.track = None
+
+    def close(self) -> None:
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+        self.task = None
+
+    async def finish(self) -> None:
+        """Turns the current message into a one line record of its track."""
+
+        if not self.message or not self.track:
+            return
+
+        await self.edit(embed=self.player.get_simplified_finished_message(self.track), view=None)
+
+    def is_latest(self) -> bool:
+        return self.player.channel.last_message_id == self.message.id
+
+    async def send(self, **kwargs) -> None:
+        await self.throttle()
+        self.message = await self.player.channel.send(**kwargs, silent=True)
+
+    async def edit(self, **kwargs) -> None:
+        await self.throttle()
+        await bot.edit_message(self.message, **kwargs)
+
+    async def throttle(self) -> None:
+        calls = PlayerMessage.calls.setdefault(self.player.channel.id, deque(maxlen=self.RATE_LIMIT))
+
+        if len(calls) == self.RATE_LIMIT:
+            delay = calls[0] + self.RATE_PERIOD - time()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        calls.append(time())
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import discord
+import psutil
+
+
+class Timing:
+    """Count, last and average of a measured duration in seconds."""
+
+    __slots__ = ('count', 'last', 'total')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.last: Optional[float] = None
+        self.total = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.last = seconds
+        self.total += seconds
+
+    def to_dict(self) -> dict:
+        return dict(
+            count=self.count,
+            last=round(self.last, 3) if self.last is not None else None,
+            average=round(self.total / self.count, 3) if self.count else None,
+        )
+
+
+class PlayerTelemetry:
+    """
+    Counters of a player's audio pipeline.
+
+    The voice send loop and the player feed the counters as they go, while the
+    FFmpeg process is only looked at when a sample is asked for.
+    """
+
+    def __init__(self) -> None:
+        self.ffmpeg_starts = 0
+        # Starts that pick a track up again after an error or a reconnect
+        self.ffmpeg_restarts = 0
+        self.underruns = 0
+        self.frames = 0
+        self.extract = Timing()
+        self.ffmpeg_start = Timing()
+        self.process: Optional[psutil.Process] = None
+
+    def source_created(self, restart: bool = False) -> None:
+        self.ffmpeg_starts += 1
+
+        # Repeats and replays of a track start it again on purpose
+        if restart:
+            self.ffmpeg_restarts += 1
+
+    def sample(self, source: Optional[discord.AudioSource]) -> dict:
+        """Reads the cpu and memory of the FFmpeg process behind the source."""
+
+        process = getattr(source, '_process', None)
+
+        if not process or process.poll() is not None:
+            self.process = None
+            return dict(pid=None, cpu_percent=None, rss_mb=None)
+
+        try:
+            if not self.process or self.process.pid != process.pid:
+                self.process = psutil.Process(process.pid)
+
+            with self.process.oneshot():
+                # Measured since the previous sample, so the first one of a process reads 0
+                return dict(
+                    pid=process.pid,
+                    cpu_percent=self.process.cpu_percent(interval=None),
+                    rss_mb=round(self.process.memory_info().rss / 1024 / 1024, 1),
+                )
+        except psutil.Error:
+            self.process = None
+            return dict(pid=None, cpu_percent=None, rss_mb=None)
+
+    def to_dict(self) -> dict:
+        return dict(
+            ffmpeg_starts=self.ffmpeg_starts,
+            ffmpeg_restarts=self.ffmpeg_restarts,
+            underruns=self.underruns,
+            frames=self.frames,
+            extract=self.extract.to_dict(),
+            ffmpeg_start=self.ffmpeg_start.to_dict(),
+        )
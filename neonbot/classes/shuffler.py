@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import random
+from typing import Callable, Dict, Iterable, List, Optional
+
+from neonbot.classes.track import Track
+
+
+class Shuffler:
+    """
+    Picks tracks in random order without repeats until the whole queue has played.
+
+    The unplayed tracks of the cycle are kept in a pool that is drawn from with an
+    incremental Fisher-Yates shuffle, so drawing, adding and removing a track
+    are O(1) regardless of the queue size. on_change is told about refills and
+    played tracks, the only changes to the cycle that don't come from the queue.
+    """
+
+    def __init__(self, on_change: Optional[Callable[[str, List[Track]], None]] = None) -> None:
+        self.remaining: List[Track] = []
+        self.positions: Dict[Track, int] = {}
+        self.next: Optional[Track] = None
+        self.on_change = on_change
+
+    @property
+    def unplayed(self) -> List[Track]:
+        """Tracks left in the cycle, including the one drawn ahead of time."""
+
+        return self.remaining + [self.next] if self.next else self.remaining
+
+    def peek(self, queue: Iterable[Track], current: Optional[Track]) -> Optional[Track]:
+        """Returns the track that advance() will return, drawing it ahead of time."""
+
+        if self.next is None:
+            if not self.remaining:
+                self.refill(queue, current)
+
+            if self.remaining:
+                self.next = self.remaining[random.randrange(len(self.remaining))]
+                self.discard(self.next)
+
+        return self.next
+
+    def advance(self, queue: Iterable[Track], current: Optional[Track]) -> Optional[Track]:
+        track = self.peek(queue, current)
+        self.next = None
+
+        if track and self.on_change:
+            self.on_change('advance', [track])
+
+        return track
+
+    def refill(self, queue: Iterable[Track], current: Optional[Track]) -> None:
+        tracks = list(queue)
+
+        # The track that just played can't come right back unless it's the only one
+        self.remaining = [track for track in tracks if track is not current] or tracks
+        self.positions = {track: index for index, track in enumerate(self.remaining)}
+
+        if self.on_change:
+            self.on_change('refill', self.remaining)
+
+    def add(self, track: Track) -> None:
+        # Once the cycle is over the next refill picks it up
+        if not self.unplayed:
+            return
+
+        self.positions[track] = len(self.remaining)
+        self.remaining.append(track)
+
+    def remove(self, track: Track) -> None:
+        if self.next is track:
+            self.next = None
+
+        self.discard(track)
+
+    def discard(self, track: Track) -> None:
+        index = self.positions.pop(track, None)
+
+        if index is None:
+            return
+
+        last = self.remaining.pop()
+
+        if last is not track:
+            self.remaining[index] = last
+            self.positions[last] = index
+
+    def load(self, remaining: Iterable[Track]) -> None:
+        self.remaining = list(remaining)
+        self.positions = {track: index for index, track in enumerate(self.remaining)}
+        self.next = None
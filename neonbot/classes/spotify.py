@@ -1,7 +1,7 @@
 import asyncio
 import urllib.parse
 from time import time
-from typing import Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import discord
@@ -13,7 +13,9 @@ from neonbot.classes.embed import Embed
 from neonbot.classes.player import Player
 from neonbot.classes.with_interaction import WithInteraction
 from neonbot.classes.ytdl import Ytdl
+from neonbot.classes.ytdl_info import YtdlInfo
 from neonbot.classes.ytmusic import YTMusic
+from neonbot.models.spotify_match import SpotifyMatchModel
 from neonbot.utils import log
 from neonbot.utils.exceptions import ApiError, YtdlError
 
@@ -21,6 +23,11 @@ from neonbot.utils.exceptions import ApiError, YtdlError
 class Spotify(WithInteraction):
     CREDENTIALS = {'token': None, 'expiration': 0}
     BASE_URL = 'https://api.spotify.com/v1'
+    CONVERT_CONCURRENCY = env.int('SPOTIFY_CONVERT_CONCURRENCY', default=5)
+    PROGRESS_INTERVAL = 2
+    MAX_RETRIES = 5
+    # Requests to the api host in flight at once, shared across every conversion
+    REQUEST_SEMAPHORE = asyncio.Semaphore(env.int('SPOTIFY_MAX_CONCURRENT_REQUESTS', default=4))
 
     def __init__(self, interaction: discord.Interaction) -> None:
         super().__init__(interaction)
@@ -99,41 +106,60 @@ class Spotify(WithInteraction):
         return await self.request(self.url_prefix + '/' + self.id)
 
     async def get_playlist(self) -> Tuple[list, dict]:
-        playlist = []
-
         if self.is_album:
             limit = 50
         else:
             limit = 100
 
-        offset = 0
-        playlist_info = await self.get_playlist_info()
-
-        while True:
-            data = await self.request(
+        async def get_page(offset):
+            return await self.request(
                 self.url_prefix + '/' + self.id + '/tracks', params={'offset': offset, 'limit': limit}
             )
 
-            if 'items' not in data:
-                break
+        playlist_info, data = await asyncio.gather(self.get_playlist_info(), get_page(0))
+
+        if 'items' not in data:
+            return [], playlist_info
+
+        playlist = data['items']
 
-            playlist += data['items']
+        if data['next'] is None:
+            return playlist, playlist_info
 
-            if data['next'] is None:
+        # The first page already tells how many are left, so the rest can be fetched at once
+        pages = await asyncio.gather(*[get_page(offset) for offset in range(limit, data['total'], limit)])
+
+        for page in pages:
+            if 'items' not in page:
                 break
 
-            offset += limit
+            playlist += page['items']
 
         return playlist, playlist_info
 
     async def request(self, url: str, params: dict = None):
-        token = await self.get_token()
+        tries = 0
+
+        while True:
+            token = await self.get_token()
 
-        res = await bot.session.get(Spotify.BASE_URL + url, headers={'Authorization': f'Bearer {token}'}, params=params)
+            async with Spotify.REQUEST_SEMAPHORE:
+                res = await bot.session.get(
+                    Spotify.BASE_URL + url, headers={'Authorization': f'Bearer {token}'}, params=params
+                )
 
-        return await res.json()
+            if res.status != 429 or tries >= Spotify.MAX_RETRIES:
+                return await res.json()
 
-    async def search_url(self, url: str) -> None:
+            # Gives the connection back to the session while waiting
+            res.release()
+
+            tries += 1
+            retry_after = int(res.headers.get('Retry-After', 1))
+            log.warn(f'Spotify rate limited. Retrying after {retry_after}s...[{tries}]')
+            await asyncio.sleep(retry_after)
+
+    async def search_url(self, url: str, on_queued: Optional[Callable[[], Awaitable]] = None) -> None:
         url = self.parse_url(url)
 
         if not url:
@@ -162,7 +188,8 @@ class Spotify(WithInteraction):
             await self.send_message(embed=Embed(t('music.youtube_no_song')))
             return
 
-        data = await self.process_playlist(playlist)
+        queue_index = len(player.queue) + 1
+        data = await self.process_playlist(playlist, player, on_queued)
 
         if len(data) == 0:
             await self.send_message(embed=Embed(t('music.youtube_failed_to_find_similar')))
@@ -178,12 +205,9 @@ class Spotify(WithInteraction):
             embed.set_image(playlist_info.get('thumbnail'))
             embed.set_footer('Uploaded by: ' + playlist_info.get('uploader'))
         else:
-            embed = Embed(
-                t('music.added_to_queue', queue=len(player.queue) + 1, title=data[0]['title'], url=data[0]['url'])
-            )
+            embed = Embed(t('music.added_to_queue', queue=queue_index, title=data[0]['title'], url=data[0]['url']))
 
         await self.send_message(embed=embed)
-        player.add_to_queue(data, requested=self.interaction.user)
 
     async def get_playlist_info(self):
         uploader = None
@@ -207,24 +231,86 @@ class Spotify(WithInteraction):
 
             return None
 
-    async def process_playlist(self, playlist):
-        async def search(item):
-            track = item['track'] if self.is_playlist else item
+    async def process_playlist(
+        self, playlist: list, player: Player, on_queued: Optional[Callable[[], Awaitable]] = None
+    ) -> List[dict]:
+        """
+        Converts the tracks with a bounded number of searches at a time. Matches are
+        added to the player's queue in playlist order as soon as they resolve.
+        """
+
+        tracks = [item['track'] if self.is_playlist else item for item in playlist]
+        tracks = [track for track in tracks if track and track.get('id')]
+        matches = await SpotifyMatchModel.get_matches(tracks)
+        semaphore = asyncio.Semaphore(Spotify.CONVERT_CONCURRENCY)
+
+        results: Dict[int, Optional[dict]] = {}
+        added = []
+        progress = dict(next_index=0, done=0, last_update=time())
+
+        async def convert(index, track):
+            async with semaphore:
+                results[index] = await self.search(track, matches.get(track['id']))
+
+            progress['done'] += 1
+
+            # Only the contiguous resolved head can be queued without breaking the order
+            data = []
+            while progress['next_index'] in results:
+                item = results.pop(progress['next_index'])
+                progress['next_index'] += 1
+
+                if item:
+                    data.append(item)
 
-            try:
-                keyword = f'{" ".join(artist["name"] for artist in track["artists"])} {track["name"]}'
+            if data:
+                player.add_to_queue(data, requested=self.interaction.user)
+                added.extend(data)
 
-                ytdl_info = await YTMusic().search(keyword)
+                if on_queued and len(added) == len(data):
+                    await on_queued()
 
-                track = ytdl_info.get_track()
+            if len(tracks) > 1 and time() - progress['last_update'] >= Spotify.PROGRESS_INTERVAL:
+                progress['last_update'] = time()
+                await self.send_message(
+                    embed=Embed(t('music.converting_progress', done=progress['done'], total=len(tracks)))
+                )
 
-                if not track.get('id'):
-                    raise YtdlError()
-            except YtdlError:
-                return None
+        await asyncio.gather(*[convert(index, track) for index, track in enumerate(tracks)])
 
-            return track
+        return added
 
-        data = await asyncio.gather(*[search(item) for item in playlist])
+    async def search(self, track: dict, match: Optional[SpotifyMatchModel]) -> Optional[dict]:
+        if match and not match.is_stale:
+            return self.get_match_track(match)
 
-        return list(filter(None, data))
+        try:
+            keyword = f'{" ".join(artist["name"] for artist in track["artists"])} {track["name"]}'
+
+            ytdl_info = await YTMusic().search(keyword)
+
+            data = ytdl_info.get_stub()
+
+            if not data.get('id'):
+                raise YtdlError()
+        except (YtdlError, IndexError):
+            # Stale matches are still better than nothing
+            return self.get_match_track(match) if match else None
+
+        try:
+            await SpotifyMatchModel.save_match(track, data)
+        except Exception as error:
+            # A missed write only means the track is searched again next time
+            log.warn(f'Failed to save spotify match of {track["id"]}: {error}')
+
+        return data
+
+    def get_match_track(self, match: SpotifyMatchModel) -> dict:
+        return YtdlInfo(
+            {
+                'id': match.video_id,
+                'title': match.title,
+                'duration': match.duration,
+                'original_url': 'https://www.youtube.com/watch?v=' + match.video_id,
+            }
+        ).get_stub()
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+from time import time
+from typing import List, Set
+
+from envparse import env
+
+from neonbot import bot
+from neonbot.classes.player import Player
+from neonbot.classes.track import Track
+from neonbot.classes.ytdl import Ytdl
+from neonbot.classes.ytdl_cache import YtdlCache
+from neonbot.enums import ExtractPriority
+from neonbot.utils import log
+from neonbot.utils.exceptions import YtdlError
+
+
+class StreamRefresher:
+    """
+    Re-resolves the streams of upcoming tracks before they expire.
+
+    Every run looks at the next few tracks of each active player and refreshes
+    the ones whose stream expires within the extraction cache's margin, which is
+    also when the cache stops handing that stream out.
+    """
+
+    # In seconds
+    INTERVAL = 60
+    LOOKAHEAD = env.int('STREAM_REFRESH_LOOKAHEAD', default=5)
+    # Refreshes started per run across every player
+    RATE_LIMIT = env.int('STREAM_REFRESH_RATE_LIMIT', default=10)
+    CONCURRENCY = 2
+
+    refreshing: Set[Track] = set()
+
+    @staticmethod
+    def start_listener():
+        if bot.scheduler.get_job('stream-refresher') or Ytdl.DOWNLOAD:
+            return
+
+        bot.scheduler.add_job(
+            id='stream-refresher',
+            func=StreamRefresher.run,
+            trigger='interval',
+            seconds=StreamRefresher.INTERVAL,
+            next_run_time=datetime.now() + timedelta(seconds=StreamRefresher.INTERVAL),
+        )
+        log.info('Auto started job stream-refresher')
+
+    @staticmethod
+    def is_expiring(track: Track) -> bool:
+        expiry = Ytdl.get_expiry(track.stream) if track.stream else None
+
+        return expiry is not None and expiry - time() <= YtdlCache.EXPIRY_MARGIN
+
+    @staticmethod
+    async def run():
+        due: List[tuple[Player, Track]] = []
+
+        for player in list(Player.servers.values()):
+            if not player.connection:
+                continue
+
+            for track in player.get_upcoming_tracks(StreamRefresher.LOOKAHEAD):
+                if track not in StreamRefresher.refreshing and StreamRefresher.is_expiring(track):
+                    due.append((player, track))
+
+        if not due:
+            return
+
+        # Soonest to expire first, the rest wait for the next run
+        due.sort(key=lambda item: Ytdl.get_expiry(item[1].stream))
+        due = due[: StreamRefresher.RATE_LIMIT]
+        semaphore = asyncio.Semaphore(StreamRefresher.CONCURRENCY)
+
+        async def refresh(player: Player, track: Track):
+            StreamRefresher.refreshing.add(track)
+
+            try:
+                async with semaphore:
+                    await player.resolve_track(track, ExtractPriority.PREFETCH)
+            except YtdlError as error:
+                log.warn(f'Failed to refresh stream of {track.title}: {error}')
+            finally:
+                StreamRefresher.refreshing.discard(track)
+
+        await asyncio.gather(*[refresh(player, track) for player, track in due])
+
+        log.info(f'Refreshed {len(due)} expiring streams')
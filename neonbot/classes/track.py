@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import discord
+
+from neonbot import bot
+from neonbot.classes.ytdl_cache import YtdlCache
+from neonbot.classes.ytdl_info import YtdlInfo
+from neonbot.utils.functions import format_seconds
+
+
+class Track:
+    """
+    A track in the player's queue.
+
+    Only what the queue and the player messages need is kept on the object.
+    Heavy details like the description are read from the extraction cache
+    when asked for. Supports dict style access so it can be used like the
+    plain track dicts.
+    """
+
+    __slots__ = ('id', 'title', 'duration', 'url', 'stream', 'codec', 'is_live', 'is_stub', 'requested', 'slot')
+
+    DETAILS = ('description', 'uploader', 'thumbnail', 'view_count', 'upload_date')
+
+    def __init__(self, data: dict, requested: Optional[discord.User] = None) -> None:
+        self.requested = requested
+        # Where the track sits in its TrackQueue
+        self.slot = -1
+        self.update(data)
+
+    def update(self, data: dict) -> None:
+        self.id = data.get('id')
+        self.title = data.get('title')
+        self.duration = data.get('duration')
+        self.url = data.get('url')
+        self.stream = data.get('stream')
+        self.codec = data.get('acodec')
+        self.is_live = data.get('is_live')
+        self.is_stub = YtdlInfo.is_stub(data)
+
+    @property
+    def formatted_duration(self) -> str:
+        return format_seconds(self.duration) if self.duration else 'N/A'
+
+    def get_details(self) -> Optional[dict]:
+        result = YtdlCache.peek(self.id) if self.id else None
+
+        if not result:
+            return None
+
+        return YtdlInfo(result).format_detailed_result(result)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for names that aren't slots or properties
+        if name not in Track.DETAILS:
+            raise AttributeError(name)
+
+        details = self.get_details()
+
+        return details.get(name) if details else None
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return key in Track.__slots__ or key in Track.DETAILS or key == 'formatted_duration'
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> dict:
+        data = dict(
+            id=self.id,
+            title=self.title,
+            duration=self.duration,
+            url=self.url,
+            is_live=self.is_live,
+            requested=self.requested.id if self.requested else None,
+        )
+
+        if self.is_stub:
+            data['_type'] = 'url'
+
+        return data
+
+    @staticmethod
+    def from_dict(data: dict) -> Track:
+        return Track({**data, 'stream': None}, requested=bot.get_user(data.get('requested')))
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from envparse import env
+from fuzzywuzzy import fuzz
+
+from neonbot import bot
+from neonbot.utils import log
+from neonbot.utils.constants import YOUTUBE_TRACK_INDEX_PATH
+
+
+class TrackIndex:
+    """
+    Tracks resolved from keyword searches, for answering the same searches locally.
+
+    Every track is found by the keywords that led to it and by its title. A
+    keyword or title seen before answers right away. Anything else is only
+    scored against the names sharing a word with it and needs a close match
+    that clearly beats the runner-up. Names are also kept sorted for prefix
+    lookups, which back the autocomplete of /play.
+    """
+
+    MAX_SIZE = env.int('TRACK_INDEX_SIZE', default=5000)
+    # Out of 100, lower answers more searches locally but risks the wrong track
+    MIN_SCORE = env.int('TRACK_INDEX_MIN_SCORE', default=90)
+    # Points the best match needs over the next track to be taken
+    MARGIN = 5
+    # Names sharing the most words with a keyword that get scored
+    CANDIDATES = 20
+    # In seconds
+    SAVE_DELAY = 30
+
+    entries: Dict[str, dict] = {}
+    # Normalized keyword or title to video id
+    names: Dict[str, str] = {}
+    sorted_names: List[Tuple[str, str]] = []
+    # Word to the names containing it
+    words: Dict[str, Set[str]] = {}
+    save_handle: Optional[asyncio.TimerHandle] = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return re.sub(r'\s+', ' ', text or '').strip().lower()
+
+    @classmethod
+    def load(cls) -> None:
+        try:
+            with open(YOUTUBE_TRACK_INDEX_PATH, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        except ValueError as error:
+            log.warn(f'Invalid track index: {error}')
+            entries = {}
+
+        cls.entries = entries
+        cls.rebuild()
+
+    @classmethod
+    def rebuild(cls) -> None:
+        cls.names = {}
+        cls.words = {}
+
+        for video_id, entry in cls.entries.items():
+            for name in [cls.normalize(entry['title']), *entry['keywords']]:
+                if name:
+                    cls.names[name] = video_id
+
+        for name in cls.names:
+            cls.add_words(name)
+
+        cls.sorted_names = sorted(cls.names.items())
+
+    @classmethod
+    def add_words(cls, name: str) -> None:
+        for word in name.split(' '):
+            cls.words.setdefault(word, set()).add(name)
+
+    @classmethod
+    def add(cls, keyword: str, data: dict) -> None:
+        video_id = data.get('id')
+
+        if not video_id or data.get('is_live'):
+            return
+
+        entry = cls.entries.setdefault(
+            video_id, dict(id=video_id, title=data.get('title'), uploader=data.get('uploader'), keywords=[], plays=0)
+        )
+        entry['duration'] = data.get('duration')
+        entry['plays'] += 1
+
+        keyword = cls.normalize(keyword)
+
+        if keyword and keyword not in entry['keywords']:
+            entry['keywords'].append(keyword)
+
+        for name in (cls.normalize(entry['title']), keyword):
+            if name and cls.names.get(name) != video_id:
+                if name not in cls.names:
+                    insort(cls.sorted_names, (name, video_id))
+                    cls.add_words(name)
+                else:
+                    cls.sorted_names[bisect_left(cls.sorted_names, (name,))] = (name, video_id)
+
+                cls.names[name] = video_id
+
+        if len(cls.entries) > cls.MAX_SIZE:
+            cls.evict()
+
+        cls.schedule_save()
+
+    @classmethod
+    def evict(cls) -> None:
+        # The least played tenth goes at once so this stays rare
+        count = max(1, len(cls.entries) // 10)
+
+        for entry in sorted(cls.entries.values(), key=lambda item: item['plays'])[:count]:
+            del cls.entries[entry['id']]
+
+        cls.rebuild()
+
+    @classmethod
+    async def find(cls, keyword: str) -> Optional[dict]:
+        """Returns the indexed track the keyword means, if there is no doubt about it."""
+
+        keyword = cls.normalize(keyword)
+
+        if not keyword:
+            return None
+
+        video_id = cls.names.get(keyword)
+
+        if video_id is None:
+            candidates = cls.get_candidates(keyword)
+
+            if not candidates:
+                return None
+
+            video_id = await bot.loop.run_in_executor(bot.executor, cls.match, keyword, candidates)
+
+        return cls.entries.get(video_id) if video_id else None
+
+    @classmethod
+    def get_candidates(cls, keyword: str) -> List[Tuple[str, str]]:
+        shared = Counter()
+
+        for word in set(keyword.split(' ')):
+            shared.update(cls.words.get(word, ()))
+
+        return [(name, cls.names[name]) for name, _ in shared.most_common(cls.CANDIDATES)]
+
+    @classmethod
+    def match(cls, keyword: str, candidates: List[Tuple[str, str]]) -> Optional[str]:
+        """Runs in the executor. Returns the video id of the candidate that clearly matches the keyword best."""
+
+        words = keyword.split(' ')
+        numbers = cls.get_numbers(words)
+        scores: Dict[str, int] = {}
+
+        for name, video_id in candidates:
+            name_words = name.split(' ')
+
+            # Typos are forgiven, but a missing word or another number is another track
+            if len(name_words) != len(words) or cls.get_numbers(name_words) != numbers:
+                continue
+
+            scores[video_id] = max(scores.get(video_id, 0), fuzz.token_sort_ratio(keyword, name))
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+        if not ranked or ranked[0][1] < cls.MIN_SCORE:
+            return None
+
+        if len(ranked) > 1 and ranked[0][1] - ranked[1][1] < cls.MARGIN:
+            return None
+
+        return ranked[0][0]
+
+    @staticmethod
+    def get_numbers(words: List[str]) -> Set[str]:
+        return {word for word in words if any(char.isdigit() for char in word)}
+
+    @classmethod
+    def suggest(cls, prefix: str, limit: int = 25) -> List[dict]:
+        """Returns the most played tracks with a keyword or title starting with the prefix."""
+
+        prefix = cls.normalize(prefix)
+
+        if not prefix:
+            return sorted(cls.entries.values(), key=lambda item: item['plays'], reverse=True)[:limit]
+
+        found = {}
+
+        for name, video_id in cls.sorted_names[bisect_left(cls.sorted_names, (prefix,)) :]:
+            if not name.startswith(prefix):
+                break
+
+            found[video_id] = cls.entries[video_id]
+
+        return sorted(found.values(), key=lambda item: item['plays'], reverse=True)[:limit]
+
+    @classmethod
+    def schedule_save(cls) -> None:
+        if cls.save_handle:
+            return
+
+        cls.save_handle = asyncio.get_event_loop().call_later(cls.SAVE_DELAY, cls.save)
+
+    @classmethod
+    def save(cls) -> None:
+        if cls.save_handle:
+            cls.save_handle.cancel()
+
+        cls.save_handle = None
+
+        try:
+            with open(YOUTUBE_TRACK_INDEX_PATH + '.tmp', 'w') as f:
+                json.dump(cls.entries, f)
+            os.replace(YOUTUBE_TRACK_INDEX_PATH + '.tmp', YOUTUBE_TRACK_INDEX_PATH)
+        except OSError as error:
+            log.error(f'Failed to save track index: {error}')
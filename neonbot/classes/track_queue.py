@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Iterable, Iterator, List, Optional, Union
+
+from neonbot.classes.track import Track
+
+
+class TrackQueue:
+    """
+    Tracks of a player in queue order.
+
+    Every track keeps the slot it was appended to and a removed track leaves its
+    slot empty, so nothing after it has to move. A Fenwick tree counts the taken
+    slots, which turns a slot into a queue index and back in O(log n). The queue
+    also counts the video ids it holds and their total duration, so none of them
+    needs a scan of the queue.
+    """
+
+    def __init__(self, tracks: Iterable[Track] = ()) -> None:
+        self.slots: List[Optional[Track]] = []
+        # 1-based, tree[i] counts the taken slots in (i - lowbit(i), i]
+        self.tree: List[int] = [0]
+        self.count = 0
+        self.ids: Counter[str] = Counter()
+        self.duration = 0
+        self.extend(tracks)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Track]:
+        return (track for track in self.slots if track is not None)
+
+    def __contains__(self, track: Track) -> bool:
+        return 0 <= track.slot < len(self.slots) and self.slots[track.slot] is track
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Track, List[Track]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.count)
+
+            if step != 1:
+                return list(self)[index]
+
+            tracks = []
+            slot = self.find(start) if start < stop else len(self.slots)
+
+            while len(tracks) < stop - start:
+                if self.slots[slot] is not None:
+                    tracks.append(self.slots[slot])
+                slot += 1
+
+            return tracks
+
+        if index < 0:
+            index += self.count
+
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+
+        return self.slots[self.find(index)]
+
+    def index(self, track: Track) -> int:
+        """
+        Position of the track in the queue. A removed track gets the position of
+        the first track after it, which is where it would be if it was still there.
+        """
+
+        return self.count_before(track.slot)
+
+    def count_before(self, slot: int) -> int:
+        total = 0
+        i = min(slot, len(self.slots))
+
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+
+        return total
+
+    def find(self, index: int) -> int:
+        """Returns the slot of the track at the index."""
+
+        slot = 0
+        step = 1 << (len(self.slots).bit_length() - 1) if self.slots else 0
+
+        while step:
+            if slot + step <= len(self.slots) and self.tree[slot + step] <= index:
+                slot += step
+                index -= self.tree[slot]
+            step >>= 1
+
+        return slot
+
+    def mark(self, slot: int, delta: int) -> None:
+        i = slot + 1
+
+        while i <= len(self.slots):
+            self.tree[i] += delta
+            i += i & -i
+
+    def append(self, track: Track) -> None:
+        track.slot = len(self.slots)
+        self.slots.append(track)
+
+        # The new node covers itself and the slots of the nodes below it
+        i = len(self.slots)
+        self.tree.append(1 + self.count_before(i - 1) - self.count_before(i - (i & -i)))
+
+        self.count += 1
+        self.ids[track.id] += 1
+        self.duration += track.duration or 0
+
+    def extend(self, tracks: Iterable[Track]) -> None:
+        for track in tracks:
+            self.append(track)
+
+    def pop(self, index: int) -> Track:
+        if index < 0:
+            index += self.count
+
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+
+        slot = self.find(index)
+        track = self.slots[slot]
+        self.slots[slot] = None
+        self.mark(slot, -1)
+
+        self.count -= 1
+        self.ids[track.id] -= 1
+        self.duration -= track.duration or 0
+
+        if self.ids[track.id] <= 0:
+            del self.ids[track.id]
+
+        return track
+
+    def update(self, track: Track, data: dict) -> None:
+        """Updates a track in place, keeping the totals in line with what it resolved to."""
+
+        if track not in self:
+            track.update(data)
+            return
+
+        self.duration -= track.duration or 0
+        self.ids[track.id] -= 1
+
+        if self.ids[track.id] <= 0:
+            del self.ids[track.id]
+
+        track.update(data)
+
+        self.duration += track.duration or 0
+        self.ids[track.id] += 1
+
+    def has(self, video_id: str) -> bool:
+        return video_id in self.ids
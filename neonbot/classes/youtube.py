@@ -5,9 +5,12 @@ from i18n import t
 
 from neonbot.classes.embed import Embed
 from neonbot.classes.player import Player
+from neonbot.classes.track_index import TrackIndex
 from neonbot.classes.with_interaction import WithInteraction
 from neonbot.classes.ytdl import Ytdl
+from neonbot.classes.ytdl_info import YtdlInfo
 from neonbot.classes.ytmusic import YTMusic
+from neonbot.utils import log
 from neonbot.utils.constants import YOUTUBE_REGEX
 from neonbot.utils.exceptions import YtdlError
 
@@ -19,25 +22,39 @@ class Youtube(WithInteraction):
         await self.send_message(embed=Embed(t('music.searching')))
 
         try:
-            ytdl_info = await YTMusic().search(keyword)
-            track = ytdl_info.get_track()
+            # Searches seen before are answered locally, skipping a round trip to YouTube Music
+            track = await TrackIndex.find(keyword) or (await YTMusic().search(keyword)).result
 
             if not track.get('id'):
                 raise YtdlError()
 
-            ytdl_info = await Ytdl().extract_info('https://www.youtube.com/watch?v=' + track.get('id'))
-            data = ytdl_info.get_track()
-
         except (YtdlError, IndexError):
             await self.send_message(embed=Embed(t('music.no_songs_available')))
             return
 
+        url = 'https://www.youtube.com/watch?v=' + track['id']
+
+        # The search result is enough to queue the track. Its stream is extracted while the message goes out
+        # and the player joins that extraction once the track comes up.
+        player.loop.create_task(self.resolve(keyword, url))
+        data = YtdlInfo({**track, 'original_url': url}).get_stub()
+
         await self.send_message(
             embed=Embed(t('music.added_to_queue', queue=len(player.queue) + 1, title=data['title'], url=data['url']))
         )
 
         player.add_to_queue(data, requested=self.interaction.user)
 
+    @staticmethod
+    async def resolve(keyword: str, url: str) -> None:
+        try:
+            ytdl_info = await Ytdl().extract_info(url)
+        except YtdlError as error:
+            log.warn(f'Failed to resolve {url}: {error}')
+            return
+
+        TrackIndex.add(keyword, ytdl_info.get_track())
+
     async def search_url(self, url: str):
         if not re.search(YOUTUBE_REGEX, url):
             await self.send_message(embed=Embed(t('music.invalid_youtube_url')), ephemeral=True)
@@ -1,88 +1,220 @@
 from __future__ import annotations
 
 import asyncio
-import datetime
-import functools
+import json
 import urllib.parse
+from os import path
 from time import time
+from typing import Dict, Optional
 
-import yt_dlp
 from envparse import env
 
 from neonbot import bot
+from neonbot.classes.download_cache import DownloadCache
+from neonbot.classes.ytdl_cache import YtdlCache
+from neonbot.classes.ytdl_engine import YtdlEngine
 from neonbot.classes.ytdl_info import YtdlInfo
+from neonbot.enums import ExtractPriority
 from neonbot.utils import log
-from neonbot.utils.constants import YOUTUBE_CACHE_DIR, YOUTUBE_DOWNLOADS_DIR
+from neonbot.utils.constants import YOUTUBE_CACHE_DIR, YOUTUBE_DOWNLOADS_DIR, YOUTUBE_DOWNLOADS_TMP_DIR
 from neonbot.utils.exceptions import YtdlError
 
 
 class Ytdl:
+    DOWNLOAD = env.bool('YTDL_DOWNLOAD', default=False)
+    WARMUP_URL = env.str('YTDL_WARMUP_URL', default='https://www.youtube.com/watch?v=jNQXAC9IVRw')
+    # Extra params the bot extracts with: tracks, playlists and single urls
+    PROFILES = ({}, {'skip_download': True}, {'skip_download': False})
+
+    # Extractions currently running, shared by every caller asking for the same track
+    in_flight: Dict[str, dict] = {}
+    default_opts: Optional[dict] = None
+
     def __init__(self, extra_params=None) -> None:
         if extra_params is None:
             extra_params = {}
         self.loop = bot.loop
-        self.ytdl_opts = {
-            'default_search': 'ytsearch1',
-            'format': 'bestaudio/best',
-            # 'quiet': True,
-            'no_warnings': True,
-            'nocheckcertificate': True,
-            'ignoreerrors': False,
-            'extract_flat': 'in_playlist',
-            # "geo_bypass": True,
-            # "geo_bypass_country": "PH",
-            'source_address': '0.0.0.0',
-            'outtmpl': YOUTUBE_DOWNLOADS_DIR + '/%(id)s',
-            'skip_download': not env.bool('YTDL_DOWNLOAD', default=False),
-            'cachedir': YOUTUBE_CACHE_DIR,
-            'compat_opts': {'no-youtube-unavailable-videos': True},
-            'proxy': env.str('YTDL_PROXY', default=None) or None,
-            'cookiefile': env.str('YTDL_COOKIES', default=None) or None,
-            'extractor_args': {'youtube': {'player_client': ['default', '-web', '-web_safari', '-tv']}},
-            **extra_params,
+        self.profile = json.dumps(extra_params, sort_keys=True)
+        self.download = Ytdl.DOWNLOAD
+        self.ytdl_opts = {**Ytdl.get_default_opts(), **extra_params}
+        self.priority = ExtractPriority.INTERACTIVE
+        self.job = None
+
+    @classmethod
+    def get_default_opts(cls) -> dict:
+        if cls.default_opts is None:
+            cls.default_opts = {
+                'default_search': 'ytsearch1',
+                # Opus can be sent to discord as is, without being encoded again
+                'format': 'bestaudio[acodec=opus]/bestaudio/best',
+                # 'quiet': True,
+                'no_warnings': True,
+                'nocheckcertificate': True,
+                'ignoreerrors': False,
+                'extract_flat': 'in_playlist',
+                # "geo_bypass": True,
+                # "geo_bypass_country": "PH",
+                'source_address': '0.0.0.0',
+                'outtmpl': '%(id)s',
+                # Downloads are moved into place once complete so partial files are never played
+                'paths': {'home': YOUTUBE_DOWNLOADS_DIR, 'temp': YOUTUBE_DOWNLOADS_TMP_DIR},
+                'skip_download': not cls.DOWNLOAD,
+                'cachedir': YOUTUBE_CACHE_DIR,
+                'compat_opts': {'no-youtube-unavailable-videos': True},
+                'proxy': env.str('YTDL_PROXY', default=None) or None,
+                'cookiefile': env.str('YTDL_COOKIES', default=None) or None,
+                'extractor_args': {'youtube': {'player_client': ['default', '-web', '-web_safari', '-tv']}},
+            }
+
+        return cls.default_opts
+
+    @classmethod
+    def start_engine(cls) -> YtdlEngine:
+        profiles = {
+            json.dumps(extra_params, sort_keys=True): {**cls.get_default_opts(), **extra_params}
+            for extra_params in cls.PROFILES
         }
 
-    async def extract_info(self, keyword: str, download: bool = True) -> YtdlInfo:
+        return YtdlEngine.start(profiles, cls.WARMUP_URL)
+
+    async def extract_info(
+        self, keyword: str, download: bool = True, priority: ExtractPriority = ExtractPriority.INTERACTIVE
+    ) -> YtdlInfo:
+        video_id = self.get_video_id(keyword)
+        cached = self.get_cached(video_id)
+
+        if cached:
+            log.info(f'extract_info cache hit for {video_id} {YtdlCache.stats()}')
+            return YtdlInfo(cached)
+
+        key = f'{video_id or keyword.strip()}|{self.profile}|{download}'
+        flight = Ytdl.in_flight.get(key)
+
+        if flight is None:
+            self.priority = priority
+            flight = dict(task=self.loop.create_task(self.extract(keyword, download, video_id)), ytdl=self, waiters=0)
+            flight['task'].add_done_callback(lambda _: Ytdl.remove_flight(key, flight))
+            Ytdl.in_flight[key] = flight
+        else:
+            log.info(f'extract_info joined in-flight extraction for {video_id or keyword}')
+            flight['ytdl'].promote(priority)
+
+        flight['waiters'] += 1
+
+        try:
+            return YtdlInfo(await asyncio.shield(flight['task']))
+        finally:
+            flight['waiters'] -= 1
+
+            # Nobody is waiting for the result anymore
+            if flight['waiters'] == 0 and not flight['task'].done():
+                flight['task'].cancel()
+                Ytdl.remove_flight(key, flight)
+
+    @staticmethod
+    def remove_flight(key: str, flight: dict) -> None:
+        if Ytdl.in_flight.get(key) is flight:
+            del Ytdl.in_flight[key]
+
+    def promote(self, priority: ExtractPriority) -> None:
+        if priority.value >= self.priority.value:
+            return
+
+        self.priority = priority
+
+        if self.job:
+            YtdlEngine.instance.promote(self.job, priority)
+
+    async def extract(self, keyword: str, download: bool, video_id: Optional[str]) -> dict:
         tries = 0
         max_retries = 5
+        engine = Ytdl.start_engine()
+
+        while tries <= max_retries:
+            start_time = time()
+            self.job = engine.submit(self.profile, self.ytdl_opts, keyword, download, self.priority)
+
+            try:
+                response = await asyncio.wait_for(self.job.future, YtdlEngine.DEADLINE)
+            except asyncio.TimeoutError:
+                raise YtdlError(f'Extraction did not finish within {YtdlEngine.DEADLINE}s.')
+            finally:
+                if not self.job.future.done():
+                    self.job.future.cancel()
+                self.job = None
 
-        with yt_dlp.YoutubeDL(self.ytdl_opts) as ytdl:
-            while tries <= max_retries:
-                try:
-                    start_time = time()
-                    result = await self.loop.run_in_executor(
-                        bot.executor,
-                        functools.partial(ytdl.extract_info, keyword, download),
-                    )
-                    log.info(f'extract_info finished after {(time() - start_time):.2f}s')
-
-                    return YtdlInfo(result)
-                except yt_dlp.utils.DownloadError as error:
-                    if 'Sign in' in str(error):
-                        raise YtdlError(error)
-
-                    tries += 1
-                    log.warn(f'Download failed. Retrying...[{tries}]')
-                    if tries > max_retries:
-                        raise YtdlError(error)
-                    await asyncio.sleep(1)
-                except yt_dlp.utils.YoutubeDLError as error:
-                    raise YtdlError(error)
-                except:
-                    raise YtdlError()
+            if 'result' in response:
+                log.info(f'extract_info finished after {(time() - start_time):.2f}s')
+                result = response['result']
+
+                if download and self.download and result and result.get('id'):
+                    DownloadCache.add(result['id'])
+
+                if video_id and result:
+                    YtdlCache.set(video_id, result)
+
+                return result
+
+            message = response['message']
+
+            if response['error'] != 'download' or 'Sign in' in message:
+                raise YtdlError(message)
+
+            tries += 1
+            log.warn(f'Download failed. Retrying...[{tries}]')
+            if tries > max_retries:
+                raise YtdlError(message)
+            await asyncio.sleep(1)
+
+    def get_cached(self, video_id: Optional[str]) -> Optional[dict]:
+        if not video_id:
+            return None
+
+        result = YtdlCache.get(video_id)
+
+        # Downloaded files may have been removed since the entry was cached
+        if result and self.download and not path.exists(f'{YOUTUBE_DOWNLOADS_DIR}/{video_id}'):
+            return None
+
+        return result
 
     @staticmethod
-    def is_expired(stream_url: str) -> bool:
+    def get_video_id(keyword: str) -> Optional[str]:
+        parsed_url = urllib.parse.urlparse(keyword)
+        query_params = urllib.parse.parse_qs(parsed_url.query)
+        hostname = parsed_url.netloc.lower()
+
+        if 'list' in query_params:
+            return None
+
+        if hostname.endswith('youtu.be'):
+            return parsed_url.path.strip('/') or None
+
+        if hostname.endswith('youtube.com'):
+            if parsed_url.path == '/watch':
+                return query_params.get('v', [None])[0]
+
+            if parsed_url.path.startswith('/shorts/'):
+                return parsed_url.path.split('/')[2] or None
+
+        return None
+
+    @staticmethod
+    def get_expiry(stream_url: str) -> Optional[int]:
         parsed_url = urllib.parse.urlparse(stream_url)
         query_params = urllib.parse.parse_qs(parsed_url.query)
 
         if 'expire' in query_params:
-            expiry_timestamp = int(query_params['expire'][0])
+            return int(query_params['expire'][0])
+
+        return None
 
-            expiry_datetime = datetime.datetime.fromtimestamp(expiry_timestamp)
-            current_datetime = datetime.datetime.now()
+    @staticmethod
+    def is_expired(stream_url: str) -> bool:
+        expiry_timestamp = Ytdl.get_expiry(stream_url)
 
-            return current_datetime >= expiry_datetime
+        if expiry_timestamp is not None:
+            return time() >= expiry_timestamp
 
         return False
 
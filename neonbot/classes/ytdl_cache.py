@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from os import path
+from time import time
+from typing import Optional, Tuple
+
+from envparse import env
+
+from neonbot import bot
+from neonbot.utils import log
+from neonbot.utils.constants import YOUTUBE_EXTRACT_CACHE_DIR
+
+
+class YtdlCache:
+    """
+    Shared cache of extracted tracks keyed by video id.
+
+    Entries live in a memory LRU backed by json files on disk and expire
+    together with the stream url they hold. Expired files are pruned every
+    PRUNE_INTERVAL, so the disk only keeps tracks resolved within a TTL.
+    """
+
+    MAX_SIZE = env.int('YTDL_CACHE_SIZE', default=500)
+    DEFAULT_TTL = env.int('YTDL_CACHE_TTL', default=6 * 60 * 60)
+    # Keep a margin so a cached stream never expires mid-playback
+    EXPIRY_MARGIN = 10 * 60
+    # In seconds
+    PRUNE_INTERVAL = 60 * 60
+    KEYS = (
+        'id',
+        'title',
+        'description',
+        'uploader',
+        'duration',
+        'thumbnail',
+        'url',
+        'original_url',
+        'webpage_url',
+        'is_live',
+        'live_status',
+        'view_count',
+        'upload_date',
+        'acodec',
+        'ext',
+    )
+
+    entries: OrderedDict[str, Tuple[float, dict]] = OrderedDict()
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get(cls, video_id: str) -> Optional[dict]:
+        entry = cls.entries.get(video_id)
+
+        if entry is None:
+            entry = cls.read(video_id)
+
+            if entry is not None:
+                cls.remember(video_id, entry)
+
+        if entry is None or time() >= entry[0]:
+            cls.forget(video_id)
+            cls.misses += 1
+            return None
+
+        cls.entries.move_to_end(video_id)
+        cls.hits += 1
+
+        return entry[1]
+
+    @classmethod
+    def peek(cls, video_id: str) -> Optional[dict]:
+        """Returns the cached result even if its stream has expired, without counting it as a lookup."""
+
+        entry = cls.entries.get(video_id) or cls.read(video_id)
+
+        return entry[1] if entry else None
+
+    @classmethod
+    def set(cls, video_id: str, result: dict) -> None:
+        if not result or result.get('is_live') or result.get('_type') == 'playlist':
+            return
+
+        from neonbot.classes.ytdl import Ytdl
+
+        expiry = Ytdl.get_expiry(result.get('url') or '')
+        expires_at = expiry - cls.EXPIRY_MARGIN if expiry else time() + cls.DEFAULT_TTL
+
+        if expires_at <= time():
+            return
+
+        entry = (expires_at, {key: result[key] for key in cls.KEYS if key in result})
+        cls.remember(video_id, entry)
+        cls.write(video_id, entry)
+
+    @classmethod
+    def remember(cls, video_id: str, entry: Tuple[float, dict]) -> None:
+        cls.entries[video_id] = entry
+        cls.entries.move_to_end(video_id)
+
+        while len(cls.entries) > cls.MAX_SIZE:
+            cls.entries.popitem(last=False)
+
+    @classmethod
+    def forget(cls, video_id: str) -> None:
+        cls.entries.pop(video_id, None)
+
+        try:
+            os.remove(cls.get_path(video_id))
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def stats(cls) -> dict:
+        total = cls.hits + cls.misses
+
+        return dict(
+            hits=cls.hits,
+            misses=cls.misses,
+            ratio=cls.hits / total if total else 0,
+            size=len(cls.entries),
+        )
+
+    @staticmethod
+    def get_path(video_id: str) -> str:
+        return f'{YOUTUBE_EXTRACT_CACHE_DIR}/{video_id}.json'
+
+    @classmethod
+    def read(cls, video_id: str) -> Optional[Tuple[float, dict]]:
+        try:
+            with open(cls.get_path(video_id), 'r') as f:
+                data = json.load(f)
+                return data['expires_at'], data['result']
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as error:
+            log.warn(f'Invalid extraction cache for {video_id}: {error}')
+            return None
+
+    @classmethod
+    def write(cls, video_id: str, entry: Tuple[float, dict]) -> None:
+        file = cls.get_path(video_id)
+
+        try:
+            with open(file + '.tmp', 'w') as f:
+                json.dump({'expires_at': entry[0], 'result': entry[1]}, f)
+            os.replace(file + '.tmp', file)
+        except OSError as error:
+            log.error(f'Failed to write extraction cache for {video_id}: {error}')
+
+    @staticmethod
+    def start_listener():
+        if bot.scheduler.get_job('ytdl-cache-prune'):
+            return
+
+        # Not a coroutine, so the scheduler runs it in an executor off the event loop
+        bot.scheduler.add_job(
+            id='ytdl-cache-prune',
+            func=YtdlCache.prune,
+            trigger='interval',
+            seconds=YtdlCache.PRUNE_INTERVAL,
+            next_run_time=datetime.now() + timedelta(seconds=YtdlCache.PRUNE_INTERVAL),
+        )
+        log.info('Auto started job ytdl-cache-prune')
+
+    @classmethod
+    def prune(cls) -> None:
+        if not path.isdir(YOUTUBE_EXTRACT_CACHE_DIR):
+            return
+
+        for file in os.listdir(YOUTUBE_EXTRACT_CACHE_DIR):
+            video_id, ext = path.splitext(file)
+            entry = cls.read(video_id) if ext == '.json' else None
+
+            if entry is None or time() >= entry[0]:
+                try:
+                    os.remove(f'{YOUTUBE_EXTRACT_CACHE_DIR}/{file}')
+                except OSError:
+                    pass
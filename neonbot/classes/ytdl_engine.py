@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from envparse import env
+
+from neonbot.enums import ExtractPriority
+from neonbot.utils import log
+from ytdl_worker import extract, initialize_worker, ping
+
+
+class YtdlJob:
+    def __init__(self, args: tuple, priority: ExtractPriority) -> None:
+        self.args = args
+        self.priority = priority
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.started = False
+
+
+class YtdlEngine:
+    """
+    Runs yt-dlp extractions in a bounded pool of processes so their CPU work
+    never holds the bot's GIL.
+
+    Jobs wait in a priority queue and are only handed to a process when one is
+    free, so interactive requests overtake queued prefetches. Every process has
+    its own executor so a dead or hung one can be replaced on its own.
+    """
+
+    WORKERS = env.int('YTDL_WORKERS', default=2)
+    TIMEOUT = env.int('YTDL_TIMEOUT', default=60)
+    # Covers the wait in the queue too, so callers never wait forever for a job to be picked up
+    DEADLINE = env.int('YTDL_DEADLINE', default=180)
+
+    instance: Optional[YtdlEngine] = None
+
+    def __init__(self, profiles: Dict[str, dict], warmup_url: Optional[str]) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.initargs = (profiles, warmup_url)
+        self.executors = [self.create_executor() for _ in range(self.WORKERS)]
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.counter = itertools.count()
+        self.dispatchers = [self.loop.create_task(self.dispatch(slot)) for slot in range(self.WORKERS)]
+
+    def create_executor(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=initialize_worker,
+            initargs=self.initargs,
+        )
+
+        # Spawn and warm up the process ahead of its first request
+        executor.submit(ping)
+
+        return executor
+
+    @classmethod
+    def start(cls, profiles: Dict[str, dict], warmup_url: Optional[str] = None) -> YtdlEngine:
+        if cls.instance is None:
+            cls.instance = cls(profiles, warmup_url)
+            log.info(f'Started {cls.WORKERS} extraction processes')
+
+        return cls.instance
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls.instance is None:
+            return
+
+        for dispatcher in cls.instance.dispatchers:
+            dispatcher.cancel()
+
+        for executor in cls.instance.executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        cls.instance = None
+
+    def submit(self, profile: str, options: dict, keyword: str, download: bool, priority: ExtractPriority) -> YtdlJob:
+        job = YtdlJob((profile, options, keyword, download), priority)
+        self.queue.put_nowait((priority.value, next(self.counter), job))
+
+        return job
+
+    def promote(self, job: YtdlJob, priority: ExtractPriority) -> None:
+        if job.started or priority.value >= job.priority.value:
+            return
+
+        # The stale entry is skipped by dispatch() once the job has started
+        job.priority = priority
+        self.queue.put_nowait((priority.value, next(self.counter), job))
+
+    def recycle(self, slot: int) -> None:
+        """Replaces the process of a slot, killing it if it is still running."""
+
+        executor = self.executors[slot]
+
+        # A hung extraction never gives its process back, ProcessPoolExecutor has no public way to stop it
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.executors[slot] = self.create_executor()
+
+    async def dispatch(self, slot: int) -> None:
+        while True:
+            *_, job = await self.queue.get()
+
+            if job.started or job.future.done():
+                continue
+
+            job.started = True
+
+            try:
+                # Submitting to a pool whose process already died raises right away
+                future = self.loop.run_in_executor(self.executors[slot], extract, *job.args)
+                response = await asyncio.wait_for(future, self.TIMEOUT)
+            except asyncio.TimeoutError:
+                log.warn(f'Extraction timed out after {self.TIMEOUT}s, restarting its process')
+                self.recycle(slot)
+                response = dict(error='timeout', message=f'Extraction timed out after {self.TIMEOUT}s.')
+            except BrokenProcessPool as error:
+                log.error(f'Extraction process died, restarting it: {error}')
+                self.recycle(slot)
+                response = dict(error='unknown', message=str(error))
+            except Exception as error:
+                response = dict(error='unknown', message=str(error))
+
+            if not job.future.done():
+                job.future.set_result(response)
@@ -10,12 +10,16 @@ from neonbot.utils.functions import format_seconds
 class YtdlInfo:
     def __init__(self, result):
         self.result = result
-        self.download = env.bool('YTDL_DOWNLOAD', default=False),
+        self.download = env.bool('YTDL_DOWNLOAD', default=False)
 
     @property
     def is_playlist(self):
         return self.result.get('_type') == 'playlist'
 
+    @staticmethod
+    def is_stub(track: dict) -> bool:
+        return track.get('_type') == 'url'
+
     def is_downloaded(self, entry):
         return entry.get('id') and path.exists(f'{YOUTUBE_DOWNLOADS_DIR}/{entry.get("id")}')
 
@@ -35,11 +39,8 @@ class YtdlInfo:
             if not entry:
                 continue
 
-            # if self.is_downloaded(entry):
-            #     data.append(self.format_detailed_result(entry))
-            # else:
-            #     data.append(self.format_simple_result(entry))
-            data.append(self.format_detailed_result(entry))
+            # Flat entries only carry the basics, the rest is extracted once the track nears the play head
+            data.append(self.format_simple_result(entry))
 
         return data
 
@@ -53,6 +54,12 @@ class YtdlInfo:
         # return self.format_simple_result(self.result)
         return self.format_detailed_result(self.result)
 
+    def get_stub(self):
+        if not self.result:
+            return None
+
+        return self.format_simple_result(self.result)
+
     def format_description(self, description: str) -> str:
         if not description:
             return description
@@ -71,7 +78,8 @@ class YtdlInfo:
             id=entry.get('id'),
             title=entry.get('title', '*Not Available*'),
             duration=entry.get('duration'),
-            url=entry.get('original_url'),
+            formatted_duration=format_seconds(entry.get('duration')) if entry.get('duration') else 'N/A',
+            url=entry.get('original_url', entry.get('url')),
             is_live=entry.get('live_status') == 'is_live' or entry.get('is_live', False),
         )
 
@@ -93,6 +101,7 @@ class YtdlInfo:
             formatted_duration=format_seconds(entry.get('duration')) if entry.get('duration') else 'N/A',
             thumbnail=entry.get('thumbnail'),
             stream=stream,
+            acodec=entry.get('acodec'),
             url=entry.get('original_url', entry.get('url')),
             is_live=entry.get('is_live'),
             view_count=f'{entry.get("view_count"):,}' if entry.get('view_count') else 'N/A',
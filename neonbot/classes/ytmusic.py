@@ -1,7 +1,7 @@
 import functools
 from concurrent.futures import ThreadPoolExecutor
 from time import time
-from typing import Optional
+from typing import List
 
 from ytmusicapi import YTMusic
 
@@ -35,20 +35,21 @@ class YTMusic:
             }
         )
 
-    async def get_related_video(self, track: dict, playlist: list = None) -> Optional[int]:
+    async def get_related_videos(self, video_id: str, limit: int = 10) -> List[str]:
+        start_time = time()
         result = await bot.loop.run_in_executor(
             bot.executor,
-            functools.partial(ytmusic.get_watch_playlist, track['id'], limit=1),
+            functools.partial(ytmusic.get_watch_playlist, video_id, limit=limit),
         )
-        tracks = result.get('tracks', [])
+        log.info(f'ytmusic.get_watch_playlist finished after {(time() - start_time):.2f}s')
 
-        for track in tracks[1:]:
-            if playlist and track.get('videoId') in playlist:
-                continue
+        video_ids = []
 
+        # The first track is the seed itself
+        for track in result.get('tracks', [])[1:]:
             if track.get('videoType') == 'MUSIC_VIDEO_TYPE_ATV' and track.get('counterpart'):
-                return track.get('counterpart')['videoId']
-
-            return track.get('videoId')
+                video_ids.append(track.get('counterpart')['videoId'])
+            elif track.get('videoId'):
+                video_ids.append(track.get('videoId'))
 
-        return None
+        return video_ids
@@ -1,7 +1,8 @@
 import asyncio
 import contextlib
+import json
 import sys
-from io import StringIO
+from io import BytesIO, StringIO
 from typing import Generator, Optional, cast
 
 import discord
@@ -74,6 +75,50 @@ class Administration(commands.Cog):
             for message in messages:
                 await ctx.send(message)
 
+    @commands.command()
+    @commands.is_owner()
+    async def telemetry(self, ctx: commands.Context, export: Optional[str] = None) -> None:
+        """Shows the audio pipeline of every player, busiest first. Add `json` to export it. *BOT_OWNER"""
+
+        players = list(Player.servers.values())
+
+        # CPU usage is measured between two samples
+        for player in players:
+            player.get_telemetry()
+
+        await asyncio.sleep(1)
+
+        data = sorted(
+            [player.get_telemetry() for player in players], key=lambda item: item['cpu_percent'] or 0, reverse=True
+        )
+
+        if export == 'json':
+            await ctx.send(file=discord.File(BytesIO(json.dumps(data, indent=2).encode()), filename='telemetry.json'))
+            return
+
+        if not data:
+            await ctx.send(embed=Embed('No active players.'))
+            return
+
+        embed = Embed().set_author('Player Telemetry', icon_url=ICONS['music'])
+
+        for item in data[:25]:
+            embed.add_field(
+                f'{item["guild"]} ({item["state"]})',
+                '\n'.join(
+                    [
+                        f'CPU: `{item["cpu_percent"]}%` | RSS: `{item["rss_mb"]} MB`',
+                        f'FFmpeg: `{item["ffmpeg_starts"]}` starts, `{item["ffmpeg_restarts"]}` restarts, '
+                        f'`{item["underruns"]}` underruns',
+                        f'Extract: `{item["extract"]["average"]}s` avg | '
+                        f'FFmpeg start: `{item["ffmpeg_start"]["average"]}s` avg',
+                    ]
+                ),
+                inline=False,
+            )
+
+        await ctx.send(embed=embed)
+
     @app_commands.command(name='prune')
     @app_commands.default_permissions(manage_messages=True)
     @app_commands.guild_only()
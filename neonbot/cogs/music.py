@@ -1,8 +1,10 @@
+import math
 import re
 from typing import Optional, cast
 
 import discord
 from discord import app_commands
+from discord.app_commands.models import Choice
 from discord.ext import commands
 from i18n import t
 
@@ -10,8 +12,9 @@ from neonbot import bot
 from neonbot.classes.embed import Embed, PaginationEmbed
 from neonbot.classes.player import Player
 from neonbot.classes.spotify import Spotify
+from neonbot.classes.track_index import TrackIndex
 from neonbot.classes.youtube import Youtube
-from neonbot.enums import PlayerState, Repeat
+from neonbot.enums import ExtractPriority, PlayerState, Repeat
 from neonbot.utils import log
 from neonbot.utils.constants import ICONS, SPOTIFY_REGEX, YOUTUBE_REGEX
 from neonbot.utils.functions import format_seconds
@@ -60,24 +63,46 @@ class Music(commands.Cog):
 
         player = await Player.get_instance(interaction)
         last_index = len(player.queue) - 1
+        started = False
+
+        async def start_player():
+            nonlocal started, play_now
+
+            # Spotify playlists start playing as soon as their first track is queued
+            if started:
+                return
+
+            started = True
+
+            await player.connect(interaction.user.voice.channel)
+
+            if player.state == PlayerState.STOPPED:
+                play_now = True
+
+            if player.connection.is_playing():
+                if play_now:
+                    player.jump(last_index + 1)
+            else:
+                await player.play()
 
         if re.search(YOUTUBE_REGEX, value):
             await Youtube(interaction).search_url(value)
         elif re.search(SPOTIFY_REGEX, value):
-            await Spotify(interaction).search_url(value)
+            await Spotify(interaction).search_url(value, on_queued=start_player)
         else:
             await Youtube(interaction).search_keyword(value)
 
-        await player.connect(interaction.user.voice.channel)
+        await start_player()
 
-        if player.state == PlayerState.STOPPED:
-            play_now = True
+    @play.autocomplete(name='value')
+    async def value_autocomplete(self, interaction: discord.Interaction, current: str):
+        if re.search(YOUTUBE_REGEX, current) or re.search(SPOTIFY_REGEX, current):
+            return []
 
-        if player.connection.is_playing():
-            if play_now:
-                player.jump(last_index + 1)
-        else:
-            await player.play()
+        return [
+            Choice(name=(track['title'] or track['id'])[:100], value='https://www.youtube.com/watch?v=' + track['id'])
+            for track in TrackIndex.suggest(current)
+        ]
 
     @app_commands.command(name='nowplaying')
     @app_commands.check(in_voice)
@@ -94,24 +119,31 @@ class Music(commands.Cog):
             return
 
         now_playing = player.now_playing
+        details = now_playing.get_details()
+
+        # Stubs and tracks whose details were evicted from the cache need a fresh extraction
+        if now_playing.is_stub or not details:
+            await cast(discord.InteractionResponse, interaction.response).defer()
+            await player.resolve_track(now_playing, ExtractPriority.INTERACTIVE)
+            details = now_playing.get_details() or {}
 
         footer = player.get_footer(now_playing)
         footer.pop(1)
 
         embed = Embed()
-        embed.add_field(t('music.nowplaying.uploader'), now_playing['uploader'])
-        embed.add_field(t('music.nowplaying.upload_date'), now_playing['upload_date'])
-        embed.add_field(t('music.nowplaying.duration'), now_playing['formatted_duration'])
-        embed.add_field(t('music.nowplaying.views'), now_playing['view_count'])
-        embed.add_field(t('music.nowplaying.description'), now_playing['description'], inline=False)
+        embed.add_field(t('music.nowplaying.uploader'), details.get('uploader'))
+        embed.add_field(t('music.nowplaying.upload_date'), details.get('upload_date'))
+        embed.add_field(t('music.nowplaying.duration'), now_playing.formatted_duration)
+        embed.add_field(t('music.nowplaying.views'), details.get('view_count'))
+        embed.add_field(t('music.nowplaying.description'), details.get('description'), inline=False)
         embed.set_author(
             name=now_playing['title'],
             url=now_playing['url'],
             icon_url=ICONS['music'],
         )
-        embed.set_thumbnail(url=now_playing['thumbnail'])
+        embed.set_thumbnail(url=details.get('thumbnail'))
         embed.set_footer(text=' | '.join(footer), icon_url=now_playing['requested'].display_avatar)
-        await cast(discord.InteractionResponse, interaction.response).send_message(embed=embed)
+        await bot.send_response(interaction, embed=embed)
 
     @app_commands.command(name='playlist')
     @app_commands.check(in_voice)
@@ -120,38 +152,38 @@ class Music(commands.Cog):
         """List down all songs in the player's queue."""
 
         player = await Player.get_instance(interaction)
-        queue = player.queue
-        embeds = []
-        duration = 0
 
-        if not queue:
+        if not player.queue:
             await cast(discord.InteractionResponse, interaction.response).send_message(
                 embed=Embed(t('music.empty_playlist')), ephemeral=True
             )
             return
 
-        for i in range(0, len(player.queue), 10):
+        def get_page(page: int) -> Embed:
             temp = []
-            for index, song in enumerate(player.queue[i : i + 10], i):
-                is_current = player.track_list[player.current_track] == index
+            start = page * 10
+
+            for index, song in enumerate(player.queue[start : start + 10], start):
+                is_current = song is player.now_playing
                 title = f'`{"*" if is_current else ""}{index + 1}.` [{song["title"]}]({song["url"]})'
                 description = f"""\
 {f'~~{title}~~' if 'removed' in song else title}
 - - - `{format_seconds(song.get('duration')) if song.get('duration') else 'N/A'}` `{song['requested']}`"""
 
-                duration += song.get('duration') or 0
-
                 temp.append(description)
-            embeds.append(Embed('\n'.join(temp)))
+
+            return Embed('\n'.join(temp))
 
         footer = [
             t('music.songs', count=len(player.queue)),
-            format_seconds(duration),
+            format_seconds(player.queue.duration),
             t('music.shuffle_footer', shuffle='on' if player.shuffle else 'off'),
             t('music.repeat_footer', repeat=Repeat(player.repeat).name.lower()),
         ]
 
-        pagination = PaginationEmbed(interaction, embeds=embeds)
+        pagination = PaginationEmbed(
+            interaction, get_page=get_page, get_page_count=lambda: math.ceil(len(player.queue) / 10)
+        )
         pagination.embed.set_author(name=t('music.player_queue'), icon_url=ICONS['music'])
         pagination.embed.set_footer(text=' | '.join(footer), icon_url=bot.user.display_avatar)
         await pagination.build()
@@ -236,8 +268,7 @@ class Music(commands.Cog):
         """Stops the current player and reset the queue from the start."""
 
         player = await Player.get_instance(interaction)
-        await player.disconnect(force=True)
-        await player.play()
+        await player.reconnect()
 
         msg = 'Player reconnected.'
         log.cmd(interaction, msg)
@@ -16,6 +16,7 @@ from yt_dlp import version as ytdl_version
 from neonbot import __author__, __title__, __version__, bot
 from neonbot.classes.embed import Embed
 from neonbot.classes.gemini import GeminiChat
+from neonbot.classes.ytdl_cache import YtdlCache
 from neonbot.utils.constants import ICONS
 from neonbot.utils.functions import format_seconds, generate_profile_member_embed, generate_profile_user_embed
 
@@ -39,6 +40,7 @@ class Utility(commands.Cog):
         """Shows the information of the bot."""
 
         process = psutil.Process(os.getpid())
+        ytdl_cache = YtdlCache.stats()
 
         embed = Embed()
         embed.set_author(f'{__title__} v{__version__}', icon_url=bot.user.display_avatar)
@@ -54,6 +56,10 @@ class Utility(commands.Cog):
             inline=True,
         )
         embed.add_field('Uptime', format_seconds(time() - process.create_time()).split('.')[0])
+        embed.add_field(
+            'Extraction Cache',
+            f"{ytdl_cache['hits']} hits / {ytdl_cache['misses']} misses ({ytdl_cache['ratio']:.0%})",
+        )
         embed.add_field(
             'Packages',
             f"""
@@ -1,2 +1,3 @@
+from neonbot.enums.extract_priority import ExtractPriority
 from neonbot.enums.player_state import PlayerState
 from neonbot.enums.repeat import Repeat
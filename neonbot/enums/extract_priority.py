@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class ExtractPriority(Enum):
+    INTERACTIVE = 0
+    PLAYBACK = 1
+    AUTOPLAY = 2
+    PREFETCH = 3
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from beanie import Document
+from beanie.odm.operators.find.comparison import In
+from envparse import env
+
+MATCH_TTL = timedelta(days=env.int('SPOTIFY_MATCH_TTL_DAYS', default=30))
+MAX_CACHED_MATCHES = env.int('SPOTIFY_MATCH_CACHE_SIZE', default=10000)
+
+matches: OrderedDict[str, SpotifyMatchModel] = OrderedDict()
+
+
+class SpotifyMatchModel(Document):
+    id: str
+    isrc: Optional[str] = None
+    video_id: str
+    title: Optional[str] = None
+    duration: Optional[int] = None
+    updated_at: datetime
+
+    class Settings:
+        name = 'spotify_matches'
+        indexes = ['isrc']
+
+    @property
+    def is_stale(self) -> bool:
+        return datetime.now() - self.updated_at > MATCH_TTL
+
+    @staticmethod
+    def remember(match: SpotifyMatchModel, track_id: str = None) -> None:
+        track_id = track_id or match.id
+        matches[track_id] = match
+        matches.move_to_end(track_id)
+
+        while len(matches) > MAX_CACHED_MATCHES:
+            matches.popitem(last=False)
+
+    @staticmethod
+    async def get_matches(tracks: List[dict]) -> Dict[str, SpotifyMatchModel]:
+        """Looks up the matches of spotify tracks by id, then by isrc. Keys are spotify track ids."""
+
+        result = {}
+        missing = []
+
+        for track in tracks:
+            if track['id'] in matches:
+                matches.move_to_end(track['id'])
+                result[track['id']] = matches[track['id']]
+            else:
+                missing.append(track)
+
+        if not missing:
+            return result
+
+        track_ids = [track['id'] for track in missing]
+
+        for match in await SpotifyMatchModel.find(In(SpotifyMatchModel.id, track_ids)).to_list():
+            SpotifyMatchModel.remember(match)
+            result[match.id] = match
+
+        isrcs = {
+            SpotifyMatchModel.get_isrc(track): track['id']
+            for track in missing
+            if track['id'] not in result and SpotifyMatchModel.get_isrc(track)
+        }
+
+        if isrcs:
+            for match in await SpotifyMatchModel.find(In(SpotifyMatchModel.isrc, list(isrcs.keys()))).to_list():
+                SpotifyMatchModel.remember(match, isrcs[match.isrc])
+                result[isrcs[match.isrc]] = match
+
+        return result
+
+    @staticmethod
+    async def save_match(track: dict, data: dict) -> None:
+        match = SpotifyMatchModel(
+            id=track['id'],
+            isrc=SpotifyMatchModel.get_isrc(track),
+            video_id=data['id'],
+            title=data.get('title'),
+            duration=data.get('duration'),
+            updated_at=datetime.now(),
+        )
+        SpotifyMatchModel.remember(match)
+        await match.save()
+
+    @staticmethod
+    def get_isrc(track: dict) -> Optional[str]:
+        return (track.get('external_ids') or {}).get('isrc')
@@ -3,10 +3,15 @@ LOG_FORMAT = '%(asctime)s [%(levelname)s] [%(module)s.%(funcName)s:%(lineno)d]:
 
 YOUTUBE_TMP_DIR = './tmp/youtube_dl'
 YOUTUBE_DOWNLOADS_DIR = './tmp/youtube_dl/downloads'
+YOUTUBE_DOWNLOADS_TMP_DIR = './tmp/youtube_dl/downloads_tmp'
+YOUTUBE_DOWNLOADS_INDEX_PATH = './tmp/youtube_dl/downloads.json'
+YOUTUBE_TRACK_INDEX_PATH = './tmp/youtube_dl/tracks.json'
 YOUTUBE_CACHE_DIR = './tmp/youtube_dl/cache'
+YOUTUBE_EXTRACT_CACHE_DIR = './tmp/youtube_dl/cache/extract'
 PLAYER_CACHE_DIR = './tmp/players'
 
-PLAYER_CACHE_PATH = './tmp/players/%s.json'
+PLAYER_SNAPSHOT_PATH = './tmp/players/%s.snapshot'
+PLAYER_JOURNAL_PATH = './tmp/players/%s.journal'
 
 PERMISSIONS = 8
 
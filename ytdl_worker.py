@@ -0,0 +1,72 @@
+"""
+Entry points of the yt-dlp extraction processes.
+
+This module lives outside the neonbot package on purpose. Extraction processes
+are spawned, so everything they unpickle is imported from scratch, and importing
+anything under neonbot would create a second bot with discord and every model
+in each of them.
+"""
+
+from __future__ import annotations
+
+import logging
+import signal
+from typing import Dict, Optional
+
+import yt_dlp
+
+log = logging.getLogger('neonbot.ytdl_worker')
+
+# YoutubeDL instances of the current extraction process by option profile, so extractions
+# don't pay for option parsing, extractor setup and cache loading every time
+instances: Dict[str, yt_dlp.YoutubeDL] = {}
+
+
+def get_instance(profile: str, options: dict) -> yt_dlp.YoutubeDL:
+    if profile not in instances:
+        instances[profile] = yt_dlp.YoutubeDL(options)
+
+    return instances[profile]
+
+
+def warm_up(profile: str, options: dict, url: Optional[str]) -> None:
+    ytdl = get_instance(profile, options)
+    ytdl.get_info_extractor('Youtube')
+
+    # Loads the player js and signature functions into the extractor's cache
+    if url:
+        ytdl.extract_info(url, download=False, process=False)
+
+    log.info(f'YoutubeDL warmed up for profile {profile}')
+
+
+def initialize_worker(profiles: Dict[str, dict], warmup_url: Optional[str]) -> None:
+    # Shutdown is handled by the bot process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(format='%(asctime)s [%(levelname)s] [%(module)s.%(funcName)s:%(lineno)d]: %(message)s')
+    log.setLevel(logging.INFO)
+
+    for profile, options in profiles.items():
+        try:
+            warm_up(profile, options, warmup_url)
+        except Exception as error:
+            log.warning(f'YoutubeDL warm up failed for profile {profile}: {error}')
+
+
+def extract(profile: str, options: dict, keyword: str, download: bool) -> dict:
+    """Runs inside an extraction process. Errors are returned as plain data so they always survive pickling."""
+
+    try:
+        ytdl = get_instance(profile, options)
+        result = ytdl.extract_info(keyword, download)
+        return dict(result=ytdl.sanitize_info(result))
+    except yt_dlp.utils.DownloadError as error:
+        return dict(error='download', message=str(error))
+    except yt_dlp.utils.YoutubeDLError as error:
+        return dict(error='ytdl', message=str(error))
+    except Exception as error:
+        return dict(error='unknown', message=str(error))
+
+
+def ping() -> None:
+    pass